@@ -6,42 +6,66 @@ determine their linguistic roots, predict their meanings, and suggest related wo
 This project aims to blend the power of machine learning with linguistic analysis, 
 creating a useful tool for language enthusiasts.
 
-This script sets up a Flask web server, ensures necessary directories and NLTK data are available,
+This script sets up a Flask web server, ensures necessary directories are available,
 initializes the database if needed, and cleans the data. It provides an endpoint for querying the etymology
-of a word using a pre-trained machine learning model.
+of a word using an in-process etymology engine that is loaded once and kept warm between requests.
+
+Words are validated against the set of WordNet lemmas and inflected forms built by
+`models/word_filter.py build`, loaded once into memory, so validation needs neither NLTK nor a download. If
+the word list has not been built, it is built from WordNet on first use.
+
+Responses are cached by word and engine version (see models/result_cache.py); the cache size, an optional
+time to live and an optional SQLite file shared by the workers are read from the environment.
+
+The database is initialized and cleaned in the background while the server already answers from the current
+lexicon. When the database changes, or when POST /admin/reload is called, a new lexicon snapshot and engine
+are built in the background and swapped in once ready (see models/reloader.py), so new words are picked up
+without a restart.
 
 Modules used:
-- nltk: For natural language processing tasks.
 - flask: For setting up the web server.
+- models.word_filter: For the set of valid words.
 
 Author: Nazli Urenli
 Date: 07/07/2024
 """
 
 import os
-import json
-import nltk
 import subprocess
 import sys
-import ast
 import click
-from nltk.corpus import wordnet
+import threading
+from typing import Any, Dict, FrozenSet, Optional, Tuple
 from flask import Flask, render_template, request, jsonify
 
 # Append the project path to the system path
-sys.path.append('/Users/nazlidenizurenli/ndu_code/EtymoAgent')
-
-app = Flask(__name__)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Ensure NLTK data path is correct
-nltk.data.path.append("/opt/anaconda3/envs/etymoagent/nltk_data")
+from models.engine import EtymologyEngine
+from models.reloader import EngineReloader
+from models.result_cache import ResultCache
+from models.snapshot import build_snapshot, snapshot_path
+from models.word_filter import load_or_build_valid_words, valid_words_path
 
-# Download WordNet corpus if not already downloaded
-nltk.download('wordnet')
+app = Flask(__name__)
 
 # Retrieve OUTPUT_DIR from ETYMOAGENT environment variable
 OUTPUT_DIR = os.environ.get("ETYMOAGENT", "output")
 
+DB_NAME = 'etymoagent.db'
+
+# The etymology engine is loaded once, shared by all requests and replaced in the background on reloads
+_reloader: Optional[EngineReloader] = None
+_reloader_lock = threading.Lock()
+
+# Responses of recent queries, shared by all requests of this process
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+# The words accepted as queries, loaded on first use
+_valid_words: Optional[FrozenSet[str]] = None
+_valid_words_lock = threading.Lock()
+
 def ensure_output_dir() -> None:
     """
     Ensure the output directory exists; create it if it doesn't.
@@ -52,6 +76,21 @@ def ensure_output_dir() -> None:
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
 
+def get_valid_words() -> FrozenSet[str]:
+    """
+    Return the set of valid words, loading it on first use, or building it from WordNet if the word list has
+    not been built with `models/word_filter.py build`.
+
+    Returns:
+        FrozenSet[str]: The WordNet lemmas and their inflected forms.
+    """
+    global _valid_words
+    if _valid_words is None:
+        with _valid_words_lock:
+            if _valid_words is None:
+                _valid_words = load_or_build_valid_words(valid_words_path())
+    return _valid_words
+
 def is_valid_word(word: str) -> bool:
     """
     Check if the given word is valid using WordNet.
@@ -60,14 +99,18 @@ def is_valid_word(word: str) -> bool:
         word (str): The word to check.
 
     Returns:
-        bool: True if the word exists in WordNet, False otherwise.
+        bool: True if the word or the lemma it is an inflection of exists in WordNet, False otherwise.
     """
-    try:
-        # Check if the word exists in WordNet
-        return len(wordnet.synsets(word)) > 0
-    except nltk.corpus.reader.wordnet.WordNetError as e:
-        print(f"Error checking validity of word '{word}': {e}")
-        return False
+    return word in get_valid_words()
+
+def database_path() -> str:
+    """
+    Return the path of the database file.
+
+    Returns:
+        str: The database file in the data directory of the project.
+    """
+    return os.path.join(os.environ.get("ETYMOAGENT"), 'data', DB_NAME)
 
 def database_exists() -> bool:
     """
@@ -76,9 +119,7 @@ def database_exists() -> bool:
     Returns:
         bool: True if the database file exists, False otherwise.
     """
-    project_path = os.environ.get("ETYMOAGENT")
-    db_file = os.path.join(project_path, 'etymoagent.db')
-    return os.path.exists(db_file)
+    return os.path.exists(database_path())
 
 def initialize_database() -> None:
     """
@@ -120,6 +161,113 @@ def clean_data() -> None:
         except Exception as e:
             print(f"Unexpected error: {e}")
 
+def load_engine() -> EtymologyEngine:
+    """
+    Load an etymology engine configured from the environment.
+
+    Returns:
+        EtymologyEngine: The new engine.
+    """
+    matcher = os.environ.get("ETYMOAGENT_MATCHER", "qgram")
+    max_distance = int(os.environ.get("ETYMOAGENT_MAX_DISTANCE", "2"))
+    mode = os.environ.get("ETYMOAGENT_MODE", "nearest")
+    index_path = os.path.join(os.environ.get("ETYMOAGENT"), 'models', 'lexicon.bktree')
+    return EtymologyEngine(DB_NAME, matcher=matcher, index_path=index_path,
+                           max_distance=max_distance, mode=mode, snapshot_path=snapshot_path())
+
+def rebuild_snapshot() -> None:
+    """
+    Write a new lexicon snapshot from the database for the next engine generation.
+    """
+    build_snapshot(database_path(), snapshot_path())
+
+def get_reloader() -> EngineReloader:
+    """
+    Return the holder of the shared etymology engine, creating it on first use.
+
+    Returns:
+        EngineReloader: The engine reloader.
+    """
+    global _reloader
+    if _reloader is None:
+        with _reloader_lock:
+            if _reloader is None:
+                db_file = database_path()
+                poll_interval = float(os.environ.get("ETYMOAGENT_RELOAD_POLL", "5"))
+                # The snapshot too, so one rebuilt with `models/snapshot.py build-snapshot` is picked up
+                watch_paths = [db_file, db_file + '-wal', snapshot_path()]
+                _reloader = EngineReloader(load_engine, rebuild_snapshot, watch_paths=watch_paths,
+                                           poll_interval=poll_interval)
+    return _reloader
+
+def get_engine() -> Optional[EtymologyEngine]:
+    """
+    Return the shared etymology engine, loading it on first use.
+
+    Returns:
+        Optional[EtymologyEngine]: The warm etymology engine, or None while the database does not exist yet.
+    """
+    reloader = get_reloader()
+    engine = reloader.engine
+    if engine is None and database_exists():
+        engine = reloader.load()
+    return engine
+
+def get_result_cache() -> ResultCache:
+    """
+    Return the query result cache, creating it on first use.
+
+    Returns:
+        ResultCache: The result cache.
+    """
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                ttl = os.environ.get("ETYMOAGENT_CACHE_TTL")
+                _result_cache = ResultCache(max_entries=int(os.environ.get("ETYMOAGENT_CACHE_SIZE", "10000")),
+                                            ttl=float(ttl) if ttl else None,
+                                            db_path=os.environ.get("ETYMOAGENT_CACHE_DB") or None)
+    return _result_cache
+
+def answer_query(engine: EtymologyEngine, word: str) -> Tuple[Dict[str, Any], int]:
+    """
+    Look up the etymology of a valid word.
+
+    Args:
+        engine (EtymologyEngine): The engine answering the query.
+        word (str): The normalized word.
+
+    Returns:
+        Tuple[Dict[str, Any], int]: The response body and HTTP status.
+    """
+    result_dict = engine.lookup(word)
+    if result_dict is None:
+        return {'error': 'No similar word found.'}, 500
+    return result_dict, 200
+
+def prepare_database() -> None:
+    """
+    Initialize the database if needed and clean it, then load the first engine if there was none.
+
+    Runs in the background while the server is up; later changes are picked up by the file watch.
+    """
+    initialize_database()
+    clean_data()
+    reloader = get_reloader()
+    if reloader.engine is None and database_exists():
+        reloader.reload()
+
+def is_admin_request() -> bool:
+    """
+    Check that a request carries the admin token.
+
+    Returns:
+        bool: True if ETYMOAGENT_ADMIN_TOKEN is set and the X-Admin-Token header matches it.
+    """
+    token = os.environ.get("ETYMOAGENT_ADMIN_TOKEN")
+    return bool(token) and request.headers.get('X-Admin-Token') == token
+
 @app.route('/')
 def index() -> str:
     """
@@ -142,33 +290,63 @@ def get_etymology() -> jsonify:
         jsonify: The etymology information in JSON format.
     """
     word = request.form['word'].strip().lower()
-    
-    if not is_valid_word(word):
-        return jsonify({'error': 'Please enter a valid English word.'})
-    
     print(f"User word is: {word}")
     
-    cosine_program_path = os.path.join(os.environ.get("ETYMOAGENT"), 'models', 'agent.py')
-    print(f"Resolved program path: {cosine_program_path}")
     try:
-        result = subprocess.run(['python3', cosine_program_path, word], capture_output=True, text=True, check=True)
-        output = result.stdout.strip()
-        try:
-            result_dict = json.loads(output)
-            return jsonify(result_dict)
-        except json.JSONDecodeError as e:
-            print(f"Error parsing subprocess output: {e}")
-            return jsonify({'error': 'Error parsing subprocess output.'}), 500
-    except subprocess.CalledProcessError as e:
-        print(f"Subprocess error: {e}")
-        print(f"Subprocess stderr: {e.stderr}")
-        return jsonify({'error': 'Error running subprocess.'}), 500
+        if not is_valid_word(word):
+            return jsonify({'error': 'Please enter a valid English word.'}), 200
+        engine = get_engine()
+        if engine is None:
+            return jsonify({'error': 'The lexicon is still loading, please try again shortly.'}), 503
+        cache = get_result_cache()
+        cached = cache.get(engine.version, word)
+        if cached is None:
+            cached = answer_query(engine, word)
+            # Only successful responses are cached, so a failed lookup is retried by the next request
+            if cached[1] == 200:
+                cache.put(engine.version, word, cached)
+        body, status = cached
+        return jsonify(body), status
     except Exception as e:
         print(f"Unexpected error: {e}")
         return jsonify({'error': 'Unexpected error occurred.'}), 500
 
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload() -> jsonify:
+    """
+    Start building a new engine generation from the current database.
+
+    Pass rebuild=0 to load the existing snapshot without rebuilding it.
+
+    Returns:
+        jsonify: Whether the reload started and the status of the active generation.
+    """
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden.'}), 403
+    rebuild = request.form.get('rebuild', '1') != '0'
+    reloader = get_reloader()
+    started = reloader.reload(rebuild=rebuild)
+    return jsonify({'started': started, **reloader.status()}), 202
+
+@app.route('/admin/status', methods=['GET'])
+def admin_status() -> jsonify:
+    """
+    Report the active engine generation and the result cache counters.
+
+    Returns:
+        jsonify: The status of the active generation and of the result cache.
+    """
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden.'}), 403
+    return jsonify({**get_reloader().status(), 'result_cache': get_result_cache().report()})
+
 if __name__ == '__main__':
     ensure_output_dir()
-    initialize_database()
-    clean_data()
-    app.run(debug=True)
+    get_valid_words()
+    # Serve the current lexicon right away; building and cleaning the database happen in the background
+    threading.Thread(target=prepare_database, daemon=True).start()
+    get_engine()
+    get_reloader().start_watching()
+    # The Werkzeug reloader would run this block again in a child process, starting a second database build
+    # and file watcher
+    app.run(debug=True, use_reloader=False)
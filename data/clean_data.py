@@ -3,8 +3,17 @@ clean_data.py: A script to clean data in the EtymoAgent SQLite database.
 
 This script connects to the SQLite database, removes duplicate entries, cleans up long or empty meaning fields.
 This program is responsible for handling the data cleaning stage of the program.
+
+Duplicates are prevented by the UNIQUE index on `word` and rows are normalized as they are inserted (see
+data/schema.py), so cleaning is a safety net for rows written by other means. By default it only looks at the
+rows inserted or changed since the last clean; --full cleans every row.
+
+Usage:
+    python3 data/clean_data.py [--full]
+
 Modules used:
 - sqlite3: For interacting with the SQLite database.
+- data.schema: For the `words` table schema.
 
 Author: Nazli Urenli
 Date: 07/07/2024
@@ -12,8 +21,15 @@ Date: 07/07/2024
 
 import sqlite3
 import os
+import sys
+import argparse
 from typing import Optional
 
+# Make the project packages importable when this file is run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.schema import MAX_MEANING_LENGTH, ensure_words_schema
+
 def connect_to_db(dbpath: str) -> Optional[sqlite3.Connection]:
     """
     Connect to the SQLite database and return the connection object.
@@ -32,7 +48,7 @@ def connect_to_db(dbpath: str) -> Optional[sqlite3.Connection]:
         print(e)
         return None
 
-def clean_data(conn: sqlite3.Connection) -> None:
+def clean_data(conn: sqlite3.Connection, full: bool = False) -> None:
     """
     Clean the data in the SQLite database.
 
@@ -41,21 +57,26 @@ def clean_data(conn: sqlite3.Connection) -> None:
 
     Args:
         conn (sqlite3.Connection): The connection object to the SQLite database.
+        full (bool): Clean every row instead of only the rows inserted or changed since the last clean.
     """
     if conn is not None:
         try:
             cursor = conn.cursor()
-            
-            # Remove duplicate entries
-            cursor.execute("DELETE FROM words WHERE id NOT IN (SELECT MIN(id) FROM words GROUP BY word);")
+
+            # Remove duplicate entries of a database created before the UNIQUE index existed
+            ensure_words_schema(conn)
+            scope = "" if full else " AND dirty = 1"
             
             # Set meaning to None if longer than 200 characters or empty
-            cursor.execute("UPDATE words SET noun = NULL WHERE LENGTH(noun) > 200 OR noun = '';")
-            cursor.execute("UPDATE words SET adj = NULL WHERE LENGTH(adj) > 200 OR adj = '';")
-            cursor.execute("UPDATE words SET verb = NULL WHERE LENGTH(verb) > 200 OR verb = '';")
+            for column in ['noun', 'adj', 'verb']:
+                cursor.execute(f"UPDATE words SET {column} = NULL "
+                               f"WHERE (LENGTH({column}) > {MAX_MEANING_LENGTH} OR {column} = ''){scope};")
             
             # Remove entries where all meanings are null
-            cursor.execute("DELETE FROM words WHERE noun IS NULL AND adj IS NULL AND verb IS NULL;")
+            cursor.execute(f"DELETE FROM words WHERE noun IS NULL AND adj IS NULL AND verb IS NULL{scope};")
+
+            # Remember that the remaining rows are clean
+            cursor.execute("UPDATE words SET dirty = 0 WHERE dirty = 1;")
             
             conn.commit()
             print("Data cleaned successfully")
@@ -87,10 +108,14 @@ def write_to_file(datapath: str, conn: sqlite3.Connection) -> None:
         print(e)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean the EtymoAgent database.")
+    parser.add_argument('--full', action='store_true', help="Clean every row, not only the ones changed since the last clean.")
+    args = parser.parse_args()
+
     datapath = os.path.join(os.environ.get("ETYMOAGENT"), 'data')
     db_path = os.path.join(datapath, 'etymoagent.db')
     connection = connect_to_db(db_path)
     if connection:
-        clean_data(connection)
+        clean_data(connection, full=args.full)
         write_to_file(datapath, connection)
         connection.close()
@@ -0,0 +1,373 @@
+"""
+crawler.py: An asynchronous, resumable crawler for the Wiktionary pages EtymoAgent learns from.
+
+The crawler fetches category pages and the word pages they link to concurrently over a single pooled
+aiohttp session. Concurrency is bounded by the number of worker tasks, every host is rate limited,
+and failed requests are retried with exponential backoff. Every URL is recorded in a `crawl_queue` table
+in the SQLite database together with its status, so an interrupted crawl can be resumed where it stopped.
+
+What to do with a page is left to the caller: on_category returns the hrefs of the word pages linked from
+a category page, and on_word_page processes a word page; it may be a coroutine function, which lets it wait
+for room in a downstream stage and so slow the fetchers down. The base URL is configurable, so the crawler can
+be run against a local stand-in HTTP server serving recorded Wiktionary pages.
+
+With a PageCache, every fetched page is stored on disk. In refresh mode the crawler sends conditional
+requests with the cached ETag and Last-Modified validators; a page answered with 304 Not Modified, or
+whose content digest did not change, is not handed to on_word_page again.
+
+A word page handed to on_word_page is normally marked done as soon as on_word_page returns. When its rows
+are only written later, by a pipeline and a batched writer, the crawler is created with defer_done: the
+page is left 'in_progress' and the writer marks it done when the rows are committed. Pages still in progress
+when a crawl is interrupted are crawled again on resume.
+
+Modules used:
+- asyncio: For running the fetches concurrently.
+- aiohttp: For the pooled HTTP client.
+- sqlite3: For the persistent work queue.
+- data.page_cache: For the on-disk page cache.
+- data.schema: For the lock timeout of the queue's connection.
+"""
+
+import asyncio
+import inspect
+import sqlite3
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import urlsplit
+import aiohttp
+from data.page_cache import PageCache
+from data.schema import BUSY_TIMEOUT
+
+WIKTIONARY_URL = "https://en.wiktionary.org"
+USER_AGENT = "EtymoAgent/1.0 (https://github.com/nazlidenizurenli/etymoagent)"
+
+# Statuses worth retrying: rate limiting and server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class Response(NamedTuple):
+    """
+    A successful or not-modified response.
+
+    Attributes:
+        status (int): 200 or 304.
+        text (Optional[str]): The page HTML; None for a 304 response.
+        etag (Optional[str]): The ETag header.
+        last_modified (Optional[str]): The Last-Modified header.
+    """
+    status: int
+    text: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+class RateLimiter:
+    """
+    Per-host rate limiter spacing requests to the same host evenly.
+
+    Attributes:
+        interval (float): Minimum number of seconds between two requests to the same host.
+    """
+
+    def __init__(self, requests_per_second: float) -> None:
+        """
+        Args:
+            requests_per_second (float): Maximum request rate per host; 0 disables limiting.
+        """
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def wait(self, host: str) -> None:
+        """
+        Wait until the next request to a host is allowed.
+
+        Args:
+            host (str): The host about to be requested.
+        """
+        if not self.interval:
+            return
+        async with self._locks[host]:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+
+
+class WorkQueue:
+    """
+    Persistent crawl work queue stored in the `crawl_queue` table.
+
+    Each URL is either a 'category' or a 'word' page and is 'pending', 'in_progress', 'done' or 'failed'.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        """
+        Open the queue, creating its table if needed.
+
+        Args:
+            db_path (str): Path of the SQLite database.
+        """
+        self.conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS crawl_queue (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                letter TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self.conn.commit()
+
+    def reset(self) -> None:
+        """
+        Forget every URL, so the next crawl starts from scratch.
+        """
+        self.conn.execute("DELETE FROM crawl_queue")
+        self.conn.commit()
+
+    def add(self, url: str, kind: str, letter: Optional[str] = None) -> bool:
+        """
+        Add a URL to the queue unless it is already known.
+
+        Args:
+            url (str): The URL to crawl.
+            kind (str): 'category' or 'word'.
+            letter (Optional[str]): The starting letter of the words listed on a category page.
+
+        Returns:
+            bool: True if the URL was new.
+        """
+        cursor = self.conn.execute("INSERT OR IGNORE INTO crawl_queue (url, kind, letter) VALUES (?, ?, ?)",
+                                   (url, kind, letter))
+        self.conn.commit()
+        return cursor.rowcount == 1
+
+    def pending(self) -> List[Tuple[str, str, Optional[str]]]:
+        """
+        Return the URLs that are pending, failed or left in progress by an earlier run, categories first.
+
+        Returns:
+            List[Tuple[str, str, Optional[str]]]: (url, kind, letter) tuples.
+        """
+        cursor = self.conn.execute("SELECT url, kind, letter FROM crawl_queue WHERE status != 'done' "
+                                   "ORDER BY kind = 'word', rowid")
+        return cursor.fetchall()
+
+    def mark(self, url: str, status: str) -> None:
+        """
+        Record the outcome of crawling a URL.
+
+        Args:
+            url (str): The crawled URL.
+            status (str): 'in_progress', 'done' or 'failed'.
+        """
+        self.conn.execute("UPDATE crawl_queue SET status = ?, attempts = attempts + 1 WHERE url = ?", (status, url))
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class Crawler:
+    """
+    Concurrent crawler of category pages and the word pages they link to.
+
+    Attributes:
+        base_url (str): Scheme and host the hrefs found on category pages are resolved against.
+        page_cache (Optional[PageCache]): Cache the fetched pages are stored in.
+        refresh (bool): Revalidate cached pages and only process the word pages that changed.
+        defer_done (bool): Leave the word pages handed to on_word_page in progress for the consumer to mark done.
+        stats (Dict[str, int]): Counters of fetched, failed, retried, not modified and unchanged requests.
+    """
+
+    def __init__(self, db_path: str, on_category: Callable[[str, str], List[str]],
+                 on_word_page: Callable[[str, str], Union[None, Awaitable[None]]], base_url: str = WIKTIONARY_URL,
+                 concurrency: int = 8, requests_per_second: float = 5.0, max_retries: int = 3,
+                 backoff: float = 1.0, timeout: float = 30.0, page_cache: Optional[PageCache] = None,
+                 refresh: bool = False, defer_done: bool = False) -> None:
+        """
+        Args:
+            db_path (str): Path of the SQLite database holding the work queue.
+            on_category (Callable[[str, str], List[str]]): Called with a category page's HTML and letter;
+                returns the hrefs of the word pages to crawl.
+            on_word_page (Callable[[str, str], Union[None, Awaitable[None]]]): Called with a word page's URL
+                and HTML; awaited if it returns an awaitable.
+            base_url (str): Scheme and host the hrefs are resolved against.
+            concurrency (int): Maximum number of requests in flight.
+            requests_per_second (float): Maximum request rate per host; 0 disables limiting.
+            max_retries (int): Number of retries of a failed request.
+            backoff (float): Initial retry delay in seconds, doubled after every attempt.
+            timeout (float): Total timeout of a request in seconds.
+            page_cache (Optional[PageCache]): Cache to store the fetched pages in.
+            refresh (bool): Send conditional requests for cached pages and skip the word pages that
+                did not change; requires a page cache.
+            defer_done (bool): Leave the word pages handed to on_word_page 'in_progress'; the consumer marks
+                them done in the `crawl_queue` table once their rows are committed.
+        """
+        self.db_path = db_path
+        self.on_category = on_category
+        self.on_word_page = on_word_page
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.page_cache = page_cache
+        self.refresh = refresh and page_cache is not None
+        self.defer_done = defer_done
+        self.stats: Dict[str, int] = defaultdict(int)
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str,
+                    headers: Optional[Dict[str, str]] = None) -> Optional[Response]:
+        """
+        Fetch a page, retrying with exponential backoff on network errors, 429 and 5xx responses.
+
+        Args:
+            session (aiohttp.ClientSession): The pooled HTTP session.
+            url (str): The URL to fetch.
+            headers (Optional[Dict[str, str]]): Extra request headers, such as conditional request validators.
+
+        Returns:
+            Optional[Response]: The 200 or 304 response, or None if the page could not be fetched.
+        """
+        host = urlsplit(url).netloc
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.wait(host)
+            delay = self.backoff * 2 ** attempt
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status in (200, 304):
+                        self.stats['fetched' if response.status == 200 else 'not_modified'] += 1
+                        text = await response.text() if response.status == 200 else None
+                        return Response(response.status, text, response.headers.get('ETag'),
+                                        response.headers.get('Last-Modified'))
+                    if response.status not in RETRY_STATUSES:
+                        print(f"Failed to fetch URL: {url}, Status Code: {response.status}")
+                        self.stats['failed'] += 1
+                        return None
+                    retry_after = response.headers.get('Retry-After', '')
+                    if retry_after.isdigit():
+                        delay = max(delay, float(retry_after))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Error fetching URL: {url}: {e!r}")
+            if attempt < self.max_retries:
+                self.stats['retried'] += 1
+                await asyncio.sleep(delay)
+        print(f"Giving up on URL: {url}")
+        self.stats['failed'] += 1
+        return None
+
+    async def fetch_page(self, session: aiohttp.ClientSession, url: str, kind: str) -> Optional[Tuple[str, bool]]:
+        """
+        Fetch a page through the page cache.
+
+        Args:
+            session (aiohttp.ClientSession): The pooled HTTP session.
+            url (str): The URL to fetch.
+            kind (str): 'category' or 'word'.
+
+        Returns:
+            Optional[Tuple[str, bool]]: The page HTML and whether it has to be processed, which is always the
+            case outside refresh mode; None if the page could not be fetched.
+        """
+        cached = self.page_cache.get(url) if self.page_cache is not None else None
+        headers = {}
+        if self.refresh and cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        response = await self.fetch(session, url, headers)
+        if response is None:
+            return None
+        if response.status == 304:
+            if cached is None:
+                print(f"Unexpected 304 response for uncached URL: {url}")
+                return None
+            self.page_cache.touch(url)
+            return self.page_cache.content(cached.digest), False
+        if self.page_cache is None:
+            return response.text, True
+        changed = self.page_cache.store(url, kind, response.text, response.etag, response.last_modified)
+        return response.text, changed or not self.refresh
+
+    async def _worker(self, session: aiohttp.ClientSession, queue: WorkQueue,
+                      tasks: 'asyncio.Queue[Tuple[str, str, Optional[str]]]') -> None:
+        """
+        Crawl URLs from the task queue until cancelled.
+
+        Args:
+            session (aiohttp.ClientSession): The pooled HTTP session.
+            queue (WorkQueue): The persistent work queue.
+            tasks (asyncio.Queue): The in-memory queue of (url, kind, letter) tasks.
+        """
+        while True:
+            url, kind, letter = await tasks.get()
+            try:
+                page = await self.fetch_page(session, url, kind)
+                if page is None:
+                    queue.mark(url, 'failed')
+                    continue
+                html, changed = page
+                if kind == 'category':
+                    # Unchanged category pages are still scanned, so every word page they link to is revalidated
+                    for href in self.on_category(html, letter):
+                        word_url = f"{self.base_url}{href}"
+                        if queue.add(word_url, 'word'):
+                            tasks.put_nowait((word_url, 'word', None))
+                elif changed:
+                    if self.defer_done:
+                        queue.mark(url, 'in_progress')
+                    result = self.on_word_page(url, html)
+                    if inspect.isawaitable(result):
+                        await result
+                    if self.defer_done:
+                        continue
+                else:
+                    self.stats['unchanged'] += 1
+                queue.mark(url, 'done')
+            except Exception as e:
+                print(f"Error processing URL: {url}: {e!r}")
+                queue.mark(url, 'failed')
+            finally:
+                tasks.task_done()
+
+    async def run(self, seeds: List[Tuple[str, str]], resume: bool = False) -> Dict[str, int]:
+        """
+        Crawl the seed category pages and every word page they link to.
+
+        Args:
+            seeds (List[Tuple[str, str]]): (category page URL, letter) pairs.
+            resume (bool): Continue the previous crawl instead of starting from scratch.
+
+        Returns:
+            Dict[str, int]: Counters of fetched, failed, retried, not modified and unchanged requests.
+        """
+        queue = WorkQueue(self.db_path)
+        if not resume:
+            queue.reset()
+        for url, letter in seeds:
+            queue.add(url, 'category', letter)
+
+        tasks: asyncio.Queue = asyncio.Queue()
+        for task in queue.pending():
+            tasks.put_nowait(task)
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={'User-Agent': USER_AGENT}) as session:
+            workers = [asyncio.create_task(self._worker(session, queue, tasks)) for _ in range(self.concurrency)]
+            try:
+                await tasks.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                queue.close()
+        return dict(self.stats)
@@ -5,10 +5,27 @@ This script connects to a SQLite database, creates necessary tables, extracts et
 and inserts the extracted data into the database. It processes links to individual word pages, extracts relevant sections,
 and saves the data. This is the data collection stage of the program.
 
+Ingestion is a pipeline of three stages. Pages are fetched concurrently by the asynchronous crawler in
+data/crawler.py, which can resume an interrupted crawl and can be pointed at a local server with --base-url.
+Word pages are parsed on all cores by the process pool of data/pipeline.py, and the extracted rows are
+written by a single WordWriter in batched transactions. Each stage holds back the previous one when it
+falls behind, and the throughput of every stage is printed at the end.
+
+Every fetched page is kept in a compressed page cache (data/page_cache.db). --refresh revalidates the cached
+pages with conditional requests and only re-parses the word pages that changed, and --reparse rebuilds the
+`words` table from the cached pages without any network access. Word pages are parsed in a single lxml
+pass by data/extraction.py. Words are unique and rows are normalized as they are written, see data/schema.py.
+
 Modules used:
 - wikipediaapi: For interacting with Wikipedia/Wiktionary.
 - sqlite3: For interacting with the SQLite database.
-- requests: For making HTTP requests.
+- asyncio, data.crawler: For crawling Wiktionary concurrently.
+- data.writer: For batched inserts over a single connection.
+- data.schema: For the `words` table schema and row normalization.
+- data.pipeline: For parsing pages in a process pool.
+- data.page_cache: For the on-disk page cache.
+- data.extraction: For extracting the sections of a word page.
+- data.etymology_matcher: For finding the etymology pairs of every language in one pass.
 - nltk: Natural Language Toolkit for processing textual data.
 - bs4 (BeautifulSoup): For parsing HTML content.
 
@@ -18,19 +35,33 @@ Date: 07/07/2024
 
 import wikipediaapi
 import sqlite3
-import requests
 import string
 import nltk
-import re
 import time
 import os
+import sys
+import argparse
+import asyncio
 from bs4 import BeautifulSoup
-from typing import List, Tuple, Dict, Union
+from typing import List, Tuple, Dict, Union, Optional, Any, Awaitable, Iterable
+
+# Make the project packages importable when this file is run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.crawler import Crawler, WIKTIONARY_URL
+from data.writer import WordWriter
+from data.schema import BUSY_TIMEOUT, INSERT_WORD_SQL, ensure_words_schema, normalize_row
+from data.page_cache import PageCache
+from data.pipeline import ParsePipeline
+from data.extraction import extract_sections, ETYMOLOGY_SECTION
+from data.etymology_matcher import EtymologyMatcher
 
 projdir = os.environ.get("ETYMOAGENT")
 datadir = os.path.join(projdir, 'data')
 DATABASE_PATH = os.path.join(datadir, 'etymoagent.db')
+PAGE_CACHE_PATH = os.path.join(datadir, 'page_cache.db')
 langlist = ['French', 'German', 'Latin', 'Greek', 'Turkish']
+ETYMOLOGY_MATCHER = EtymologyMatcher(langlist)
 
 nltk.data.path.append("/opt/anaconda3/envs/etymoagent/nltk_data")
 
@@ -38,31 +69,20 @@ def connect_db() -> sqlite3.Connection:
     """
     Connect to the SQLite database and return the connection object.
     """
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = sqlite3.connect(DATABASE_PATH, timeout=BUSY_TIMEOUT)
     return conn
 
 def create_tables() -> None:
     """
-    Create the 'words' table in the SQLite database if it does not exist.
+    Create the 'words' table and its indexes in the SQLite database if they do not exist.
     """
     conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS words (
-            id INTEGER PRIMARY KEY,
-            word TEXT NOT NULL,
-            origin_language TEXT NOT NULL,
-            noun TEXT,
-            adj TEXT,
-            verb TEXT
-        )
-    ''')
-    conn.commit()
+    ensure_words_schema(conn)
     conn.close()
 
-def insert_word(word: str, origin_language: str, noun: str, adj: str, verb: str) -> int:
+def insert_word(word: str, origin_language: str, noun: str, adj: str, verb: str) -> Optional[int]:
     """
-    Insert a word into the 'words' table and return the inserted word's ID.
+    Normalize a word's meanings, insert it into the 'words' table and return the inserted word's ID.
 
     Args:
         word (str): The word to insert.
@@ -72,15 +92,16 @@ def insert_word(word: str, origin_language: str, noun: str, adj: str, verb: str)
         verb (str): The verb meaning of the word.
 
     Returns:
-        int: The ID of the inserted word.
+        Optional[int]: The ID of the inserted word, or None if it has no meaning left after normalization
+        or is already in the table.
     """
+    row = normalize_row((word, origin_language, noun, adj, verb))
+    if row is None:
+        return None
     conn = connect_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO words (word, origin_language, noun, adj, verb)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (word, origin_language, noun, adj, verb))
-    word_id = cursor.lastrowid
+    cursor.execute(INSERT_WORD_SQL, row)
+    word_id = cursor.lastrowid if cursor.rowcount == 1 else None
     conn.commit()
     conn.close()
     return word_id
@@ -95,13 +116,7 @@ def extract_etymology_pairs(etymology_text: str) -> List[Tuple[str, str]]:
     Returns:
         List[Tuple[str, str]]: A list of tuples containing language and word pairs.
     """
-    results = []
-    for lang in langlist:
-        pattern = rf'(?:[Ff]rom\s+)?(?:\w+\s+)?({lang})\s+([^\s,]+)'
-        matches = re.findall(pattern, etymology_text, re.IGNORECASE)
-        if matches:
-            results.append(matches[0])
-    return results
+    return ETYMOLOGY_MATCHER.find_pairs(etymology_text)
 
 def extract_etymology_text(soup: BeautifulSoup, section: str) -> List[Tuple[str, str]]:
     """
@@ -149,68 +164,174 @@ def extract_meaning_text(soup: BeautifulSoup, sections: List[str]) -> Dict[str,
                     break
     return meaning_dict
 
-def process_link(base_url: str, href: str) -> None:
+def parse_word_page(html_content: str) -> List[Tuple[str, str, str, str, str]]:
     """
-    Process a link to a word page, extract etymology and meaning, and insert them into the database.
+    Extract the etymology pairs and meanings of a word page.
 
     Args:
-        base_url (str): The base URL of the Wiktionary page.
-        href (str): The href of the link to process.
-    """
-    full_url = f"https://en.wiktionary.org{href}"
-    response = requests.get(full_url)
-    if response.status_code == 200:
-        html_content = response.text
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Extract "Etymology" section text
-        pairs = extract_etymology_text(soup, 'Etymology')
-        if not pairs:
-            return
-        # Extract "Meaning" section text
-        meaning_dict = extract_meaning_text(soup, ['Noun', 'Adjective', 'Verb'])
-        if not any(val for val in meaning_dict.values()):
-            return
-
-        # Insert the word and get its ID
-        for language, word in pairs:
-            insert_word(word, language, meaning_dict['Noun'], meaning_dict['Adjective'], meaning_dict['Verb'])
-
-def get_words(url: str, lang: str, letter: str) -> None:
-    """
-    Get words from the specified URL, process each link, and extract data.
+        html_content (str): The HTML of the word page.
+
+    Returns:
+        List[Tuple[str, str, str, str, str]]: One (word, origin_language, noun, adj, verb) row per etymology
+        pair; empty if the page has no etymology pairs or no meanings.
+    """
+    sections = extract_sections(html_content)
+
+    # Extract "Etymology" section text
+    pairs = extract_etymology_pairs(sections[ETYMOLOGY_SECTION])
+    if not pairs:
+        return []
+    # Extract "Meaning" section text
+    if not any(sections[s] for s in ['Noun', 'Adjective', 'Verb']):
+        return []
+
+    return [(word, language, sections['Noun'], sections['Adjective'], sections['Verb'])
+            for language, word in pairs]
+
+def store_word_page(url: str, html_content: str, writer: Optional[WordWriter] = None) -> None:
+    """
+    Parse a word page and insert its rows into the database.
 
     Args:
-        url (str): The URL to fetch words from.
-        lang (str): The language of the words to fetch.
-        letter (str): The starting letter of the words to fetch.
-    """
-    response = requests.get(url)
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        for link in soup.find_all('a'):
-            href = link.get('href')
-            if href and (href.startswith(f'/wiki/{letter}') or href.startswith(f'/wiki/{letter.lower()}')):
-                process_link(url, href)
-    else:
-        print(f"Failed to fetch URL: {url}, Status Code: {response.status_code}")
+        url (str): The URL of the word page.
+        html_content (str): The HTML of the word page.
+        writer (Optional[WordWriter]): Batched writer to queue the rows on; without one, each row is
+            inserted with insert_word.
+    """
+    rows = parse_word_page(html_content)
+    if writer is not None:
+        writer.put_many(rows)
+        return
+    for row in rows:
+        insert_word(*row)
+
+def extract_word_links(html_content: str, letter: str) -> List[str]:
+    """
+    Extract the links to word pages starting with the given letter from a category page.
+
+    Args:
+        html_content (str): The HTML of the category page.
+        letter (str): The starting letter of the words to keep.
+
+    Returns:
+        List[str]: The hrefs of the word pages.
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
+    hrefs = []
+    for link in soup.find_all('a'):
+        href = link.get('href')
+        if href and (href.startswith(f'/wiki/{letter}') or href.startswith(f'/wiki/{letter.lower()}')):
+            hrefs.append(href)
+    return hrefs
 
-def initialize_database() -> None:
+def category_url(base_url: str, lang: str, letter: str) -> str:
+    """
+    Build the URL of the category page listing English terms derived from a language.
+
+    Args:
+        base_url (str): Scheme and host of the Wiktionary server.
+        lang (str): The source language.
+        letter (str): The starting letter of the listed words.
+
+    Returns:
+        str: The category page URL.
+    """
+    return f'{base_url}/w/index.php?title=Category:English_terms_derived_from_{lang}&from={letter}'
+
+async def run_pipeline(pipeline: ParsePipeline, source: Awaitable) -> Any:
+    """
+    Run a page source feeding the parse pipeline, and wait until every page has been parsed.
+
+    Args:
+        pipeline (ParsePipeline): The parse stage.
+        source (Awaitable): Coroutine submitting pages to the pipeline.
+
+    Returns:
+        Any: The result of the source.
+    """
+    async with pipeline:
+        return await source
+
+async def submit_pages(pipeline: ParsePipeline, pages: Iterable[Tuple[str, str]]) -> None:
+    """
+    Submit (url, html) pages to the parse pipeline.
+
+    Args:
+        pipeline (ParsePipeline): The parse stage.
+        pages (Iterable[Tuple[str, str]]): The pages to parse.
+    """
+    for url, html_content in pages:
+        await pipeline.submit(url, html_content)
+
+def initialize_database(base_url: str = WIKTIONARY_URL, resume: bool = False, concurrency: int = 8,
+                        requests_per_second: float = 5.0, refresh: bool = False,
+                        parse_workers: Optional[int] = None) -> None:
     """
     Initialize the database by creating tables and populating them with words from Wiktionary.
+
+    Args:
+        base_url (str): Scheme and host of the Wiktionary server to crawl.
+        resume (bool): Continue an interrupted crawl instead of starting from scratch.
+        concurrency (int): Maximum number of requests in flight.
+        requests_per_second (float): Maximum request rate to the server.
+        refresh (bool): Revalidate the cached pages and only re-parse the word pages that changed.
+        parse_workers (Optional[int]): Number of parser processes; defaults to the number of CPUs.
+    """
+    create_tables()
+    seeds = [(category_url(base_url, lang, letter), letter)
+             for lang in langlist for letter in list(string.ascii_uppercase)]
+    # A refresh replaces the rows of words whose pages changed
+    with PageCache(PAGE_CACHE_PATH) as page_cache, WordWriter(DATABASE_PATH, upsert=refresh) as writer:
+        # Word pages are marked done by the writer, in the transaction committing their rows
+        pipeline = ParsePipeline(parse_word_page, writer, n_workers=parse_workers, mark_done=True)
+        crawler = Crawler(DATABASE_PATH, on_category=extract_word_links, on_word_page=pipeline.submit,
+                          base_url=base_url, concurrency=concurrency, requests_per_second=requests_per_second,
+                          page_cache=page_cache, refresh=refresh, defer_done=True)
+        stats = asyncio.run(run_pipeline(pipeline, crawler.run(seeds, resume=resume)))
+        if refresh:
+            print(f"Pruned {page_cache.prune()} stale cached pages")
+    elapsed = pipeline.stats['elapsed']
+    print(f"Fetch: {stats}, {stats.get('fetched', 0) / elapsed if elapsed else 0:.1f} pages/s")
+    print(pipeline.report())
+
+def reparse_cached_pages(parse_workers: Optional[int] = None) -> None:
+    """
+    Rebuild the 'words' table from the cached word pages, without fetching anything.
+
+    Args:
+        parse_workers (Optional[int]): Number of parser processes; defaults to the number of CPUs.
     """
     create_tables()
-    languages = langlist
-    user_agent = "EtymoAgent/1.0 (https://github.com/nazlidenizurenli/etymoagent)"
-    wiki_wiki = wikipediaapi.Wikipedia(user_agent=user_agent)
-    for lang in languages:
-        for letter in list(string.ascii_uppercase):
-            url = f'https://en.wiktionary.org/w/index.php?title=Category:English_terms_derived_from_{lang}&from={letter}'
-            get_words(url, lang, letter)
+    conn = connect_db()
+    conn.execute("DELETE FROM words")
+    conn.commit()
+    conn.close()
+    with PageCache(PAGE_CACHE_PATH) as page_cache, WordWriter(DATABASE_PATH) as writer:
+        pipeline = ParsePipeline(parse_word_page, writer, n_workers=parse_workers)
+        asyncio.run(run_pipeline(pipeline, submit_pages(pipeline, page_cache.pages('word'))))
+    print(pipeline.report())
             
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Populate the EtymoAgent database from Wiktionary.")
+    parser.add_argument('--base-url', default=WIKTIONARY_URL, help="Wiktionary server to crawl.")
+    parser.add_argument('--resume', action='store_true', help="Continue an interrupted crawl.")
+    parser.add_argument('--concurrency', type=int, default=8, help="Maximum number of requests in flight.")
+    parser.add_argument('--rate', type=float, default=5.0, help="Maximum requests per second.")
+    parser.add_argument('--refresh', action='store_true',
+                        help="Revalidate cached pages and only re-parse the ones that changed.")
+    parser.add_argument('--reparse', action='store_true',
+                        help="Rebuild the words table from the page cache without crawling.")
+    parser.add_argument('--parse-workers', type=int, default=None, help="Number of parser processes.")
+    args = parser.parse_args()
+
+    # Use the importable module so the parser pickled to the worker processes refers to data.database
+    from data.database import initialize_database as initialize, reparse_cached_pages as reparse
+
     start_time = time.time()
-    initialize_database()
+    if args.reparse:
+        reparse(args.parse_workers)
+    else:
+        initialize(args.base_url, args.resume, args.concurrency, args.rate, args.refresh, args.parse_workers)
     print("Database initialized successfully")
     end_time = time.time()
     elapsed_time = end_time - start_time
@@ -0,0 +1,152 @@
+"""
+etymology_matcher.py: Single-pass matching of "<language> <word>" etymology pairs.
+
+extract_etymology_pairs used to compile one regular expression per source language for every page and scan
+the etymology text once per language, so its cost grew with the length of the language list. EtymologyMatcher
+compiles a single pattern when it is created. The language names are merged into a trie-shaped alternation,
+so at every position of the text the regex engine follows one branch per character instead of trying every
+language in turn, and the text is scanned once whatever the number of languages.
+
+The pairs are the same as those of the old per-language pattern
+`(?:from\s+)?(?:\w+\s+)?(<language>)\s+([^\s,]+)`: matching ignores case, a language has to be followed by
+whitespace and a word (a run of characters other than whitespace and commas), and each language gets the
+match re.findall found first, that is the one whose optional "from" and word prefix start earliest. The
+pairs are returned in the order of the language list.
+
+Modules used:
+- re: For the compiled pattern.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# The word following a language name
+_FOLLOWING_WORD = re.compile(r'\s+([^\s,]+)')
+
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """
+    Build a regular expression alternation of words, factored into a trie on their common prefixes.
+
+    Args:
+        words (Iterable[str]): The words to match.
+
+    Returns:
+        str: A pattern matching any of the words, preferring the longest one at a given position.
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def to_pattern(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + to_pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        optional = '' in node
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        return f"(?:{'|'.join(branches)}){'?' if optional else ''}"
+
+    return to_pattern(trie)
+
+
+class EtymologyMatcher:
+    """
+    Precompiled matcher of "<language> <word>" pairs for a list of source languages.
+
+    Attributes:
+        languages (List[str]): The source languages, in the order pairs are returned in.
+    """
+
+    def __init__(self, languages: Iterable[str]) -> None:
+        """
+        Compile the pattern for a list of languages.
+
+        Args:
+            languages (Iterable[str]): The source languages.
+        """
+        self.languages = list(dict.fromkeys(languages))
+        self._order = {language.lower(): i for i, language in enumerate(self.languages)}
+        keys = sorted(self._order)
+        # A lookahead, so that overlapping occurrences such as "French Latin word" are all found
+        self._pattern = re.compile(f"(?=({trie_pattern(keys)}){_FOLLOWING_WORD.pattern})", re.IGNORECASE)
+        # Languages that are a prefix of a longer one, e.g. "latin" of "latin american", can start at the
+        # same position as the longer language and are checked separately after it matches
+        self._prefixes: Dict[str, List[str]] = {
+            key: [other for other in keys if other != key and key.startswith(other)] for key in keys}
+
+    def _key(self, text: str) -> Optional[str]:
+        """
+        Return the language key a matched name refers to.
+
+        Args:
+            text (str): The language name as it appears in the text.
+
+        Returns:
+            Optional[str]: The lowercased language, or None if no language matches it.
+        """
+        key = text.lower()
+        if key in self._order:
+            return key
+        # Case-insensitive matching also folds a few characters lower() does not
+        return next((k for k in self._order if re.fullmatch(re.escape(k), text, re.IGNORECASE)), None)
+
+    @staticmethod
+    def _match_start(text: str, position: int) -> int:
+        """
+        Return where the old pattern's match of a language occurrence starts, including its optional
+        "from" and word prefixes.
+
+        Args:
+            text (str): The etymology text.
+            position (int): Where the language name starts.
+
+        Returns:
+            int: The earliest start of the optional prefixes.
+        """
+        end = position
+        while end > 0 and text[end - 1].isspace():
+            end -= 1
+        word_start = end
+        while word_start > 0 and (text[word_start - 1].isalnum() or text[word_start - 1] == '_'):
+            word_start -= 1
+        if end == position or word_start == end:
+            return position
+        from_end = word_start
+        while from_end > 0 and text[from_end - 1].isspace():
+            from_end -= 1
+        if from_end < word_start and text[max(from_end - 4, 0):from_end].lower() == 'from':
+            return from_end - 4
+        return word_start
+
+    def find_pairs(self, text: str) -> List[Tuple[str, str]]:
+        """
+        Find the "<language> <word>" pair of every language in a text.
+
+        Args:
+            text (str): The etymology text.
+
+        Returns:
+            List[Tuple[str, str]]: (language as written in the text, word) pairs, in the order of the
+            language list.
+        """
+        # For each language, (match start, -position, language, word) of its best occurrence so far: the
+        # earliest match start wins, and on a tie the longer prefix, which the old pattern tried first
+        best: Dict[str, Tuple[int, int, str, str]] = {}
+        for match in self._pattern.finditer(text):
+            position = match.start()
+            key = self._key(match.group(1))
+            occurrences = [(key, match.group(1), match.group(2))] if key is not None else []
+            for prefix in self._prefixes.get(key, ()):
+                word = _FOLLOWING_WORD.match(text, position + len(prefix))
+                if word:
+                    occurrences.append((prefix, text[position:position + len(prefix)], word.group(1)))
+            start = self._match_start(text, position)
+            for occurrence_key, language, word in occurrences:
+                candidate = (start, -position, language, word)
+                if occurrence_key not in best or candidate[:2] < best[occurrence_key][:2]:
+                    best[occurrence_key] = candidate
+        return [best[key][2:] for key in sorted(best, key=self._order.__getitem__)]
@@ -0,0 +1,151 @@
+"""
+extraction.py: Single-pass extraction of the sections EtymoAgent reads from a Wiktionary word page.
+
+parse_word_page used to build a full BeautifulSoup tree with the pure Python html.parser, and then walk
+next_elements from the Etymology heading and from each of the Noun, Adjective and Verb headings in turn,
+looking each heading up with a separate soup.find. extract_sections parses the page with lxml's C parser
+and visits only the h2, h3, p and ol elements, in document order and exactly once, collecting all four
+sections as it goes. The section rules are the same as before:
+
+- A section starts at the first h3 whose id is the section name and ends at the next h2 or h3.
+- The Etymology text is the text of every paragraph in its section, each followed by a space.
+- A meaning is the text of the last ordered list in its section, followed by a space.
+
+Usage:
+    python3 data/extraction.py [--pages-dir DIR] [--repeat N]
+
+Running the module benchmarks extract_sections against the BeautifulSoup functions in data/database.py on
+recorded pages, either the word pages in the page cache or the .html files of a directory, and checks
+that both produce the same etymology pairs and meanings.
+
+Modules used:
+- lxml: For parsing the HTML.
+- argparse: For the command line interface.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+from lxml import etree
+
+ETYMOLOGY_SECTION = 'Etymology'
+MEANING_SECTIONS = ['Noun', 'Adjective', 'Verb']
+
+_HTML_PARSER = etree.HTMLParser()
+
+
+def _text(element: etree._Element) -> str:
+    """
+    Return the text of an element and its descendants, without its tail.
+
+    Args:
+        element (etree._Element): The element.
+
+    Returns:
+        str: The concatenated text.
+    """
+    return ''.join(element.itertext())
+
+
+def extract_sections(html_content: str) -> Dict[str, str]:
+    """
+    Extract the etymology text and the noun, adjective and verb meanings of a word page in one pass.
+
+    Args:
+        html_content (str): The HTML of the word page.
+
+    Returns:
+        Dict[str, str]: The text of the 'Etymology', 'Noun', 'Adjective' and 'Verb' sections; empty for a
+        section the page does not have.
+    """
+    sections = {ETYMOLOGY_SECTION: '', **{s: '' for s in MEANING_SECTIONS}}
+    root = etree.fromstring(html_content, _HTML_PARSER) if html_content.strip() else None
+    if root is None:
+        return sections
+
+    etymology_parts: List[str] = []
+    seen = set()
+    current = None
+    for element in root.iter('h2', 'h3', 'p', 'ol'):
+        tag = element.tag
+        if tag == 'h2' or tag == 'h3':
+            section = element.get('id')
+            # Only the first h3 of a section starts it, as soup.find would return
+            if tag == 'h3' and section in sections and section not in seen:
+                seen.add(section)
+                current = section
+            else:
+                current = None
+        elif current == ETYMOLOGY_SECTION:
+            if tag == 'p':
+                etymology_parts.append(_text(element) + " ")
+        elif current is not None and tag == 'ol':
+            sections[current] = _text(element) + " "
+    sections[ETYMOLOGY_SECTION] = ''.join(etymology_parts)
+    return sections
+
+
+def load_recorded_pages(pages_dir: Optional[str] = None) -> List[str]:
+    """
+    Load recorded word pages from a directory of .html files or from the page cache.
+
+    Args:
+        pages_dir (Optional[str]): Directory of .html files; the word pages of the page cache are used if not given.
+
+    Returns:
+        List[str]: The HTML of each page.
+    """
+    if pages_dir:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(pages_dir, '*.html'))):
+            with open(path, encoding='utf-8') as f:
+                pages.append(f.read())
+        return pages
+
+    from data.database import PAGE_CACHE_PATH
+    from data.page_cache import PageCache
+    with PageCache(PAGE_CACHE_PATH) as page_cache:
+        return [html_content for _, html_content in page_cache.pages('word')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark extract_sections against the BeautifulSoup extraction.")
+    parser.add_argument('--pages-dir', default=None, help="Directory of recorded .html word pages.")
+    parser.add_argument('--repeat', type=int, default=3, help="Number of timed passes over the pages.")
+    args = parser.parse_args()
+
+    # Make the project packages importable when this file is run as a script
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from bs4 import BeautifulSoup
+    from data.database import extract_etymology_pairs, extract_etymology_text, extract_meaning_text
+
+    pages = load_recorded_pages(args.pages_dir)
+    if not pages:
+        sys.exit("No recorded pages found")
+
+    def extract_with_soup(html_content):
+        soup = BeautifulSoup(html_content, 'html.parser')
+        return extract_etymology_text(soup, ETYMOLOGY_SECTION), extract_meaning_text(soup, MEANING_SECTIONS)
+
+    def extract_in_one_pass(html_content):
+        sections = extract_sections(html_content)
+        return (extract_etymology_pairs(sections[ETYMOLOGY_SECTION]),
+                {s: sections[s] for s in MEANING_SECTIONS})
+
+    mismatches = sum(extract_with_soup(p) != extract_in_one_pass(p) for p in pages)
+    print(f"{len(pages)} pages, {mismatches} with different results")
+
+    timings = {}
+    for name, extract in [('beautifulsoup', extract_with_soup), ('extract_sections', extract_in_one_pass)]:
+        best = float('inf')
+        for _ in range(args.repeat):
+            start_time = time.perf_counter()
+            for page in pages:
+                extract(page)
+            best = min(best, time.perf_counter() - start_time)
+        timings[name] = best
+        print(f"{name}: {best * 1000 / len(pages):.3f} ms per page")
+    print(f"Speedup: {timings['beautifulsoup'] / timings['extract_sections']:.1f}x")
@@ -0,0 +1,187 @@
+"""
+page_cache.py: An on-disk cache of the Wiktionary pages crawled by EtymoAgent.
+
+Every fetched page is stored in a SQLite database as a zlib-compressed blob addressed by the SHA-256 digest
+of its HTML, so identical pages are stored once. Each URL points at the digest of its latest content together
+with the ETag and Last-Modified validators the server sent, which lets a refresh crawl issue conditional
+requests and tell which pages actually changed. The cached pages can also be re-parsed offline, without any
+network access, when the extraction rules change.
+
+Modules used:
+- sqlite3: For storing the cache.
+- zlib: For compressing the page contents.
+- hashlib: For the content digests.
+- data.schema: For the lock timeout of the cache's connection.
+"""
+
+import hashlib
+import sqlite3
+import time
+import zlib
+from typing import Iterator, NamedTuple, Optional, Tuple
+from data.schema import BUSY_TIMEOUT
+
+
+class CachedPage(NamedTuple):
+    """
+    Cache entry of a URL.
+
+    Attributes:
+        digest (str): SHA-256 digest of the page HTML.
+        etag (Optional[str]): The ETag header of the cached response.
+        last_modified (Optional[str]): The Last-Modified header of the cached response.
+    """
+    digest: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+def content_digest(html_content: str) -> str:
+    """
+    Compute the digest a page is stored under.
+
+    Args:
+        html_content (str): The page HTML.
+
+    Returns:
+        str: Hex SHA-256 digest of the UTF-8 encoded HTML.
+    """
+    return hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+
+
+class PageCache:
+    """
+    Content-addressed cache of crawled pages and their HTTP validators.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        """
+        Open the cache, creating its tables if needed.
+
+        Args:
+            db_path (str): Path of the SQLite database holding the cache.
+        """
+        self.conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS page_blobs (
+                digest TEXT PRIMARY KEY,
+                content BLOB NOT NULL
+            )
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS page_cache (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    def __enter__(self) -> 'PageCache':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """
+        Look up the cache entry of a URL.
+
+        Args:
+            url (str): The page URL.
+
+        Returns:
+            Optional[CachedPage]: The entry, or None if the URL is not cached.
+        """
+        row = self.conn.execute("SELECT digest, etag, last_modified FROM page_cache WHERE url = ?",
+                                (url,)).fetchone()
+        return CachedPage(*row) if row else None
+
+    def content(self, digest: str) -> str:
+        """
+        Return the HTML stored under a digest.
+
+        Args:
+            digest (str): The content digest.
+
+        Returns:
+            str: The page HTML.
+
+        Raises:
+            KeyError: If no page is stored under the digest.
+        """
+        row = self.conn.execute("SELECT content FROM page_blobs WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(digest)
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def store(self, url: str, kind: str, html_content: str, etag: Optional[str] = None,
+              last_modified: Optional[str] = None) -> bool:
+        """
+        Store the latest content of a URL.
+
+        Args:
+            url (str): The page URL.
+            kind (str): 'category' or 'word'.
+            html_content (str): The page HTML.
+            etag (Optional[str]): The ETag header of the response.
+            last_modified (Optional[str]): The Last-Modified header of the response.
+
+        Returns:
+            bool: True if the content differs from what was cached for the URL.
+        """
+        digest = content_digest(html_content)
+        cached = self.get(url)
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO page_blobs (digest, content) VALUES (?, ?)",
+                              (digest, zlib.compress(html_content.encode('utf-8'))))
+            self.conn.execute('''
+                INSERT OR REPLACE INTO page_cache (url, kind, digest, etag, last_modified, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (url, kind, digest, etag, last_modified, time.time()))
+        return cached is None or cached.digest != digest
+
+    def touch(self, url: str) -> None:
+        """
+        Record that a URL was revalidated without changes.
+
+        Args:
+            url (str): The page URL.
+        """
+        with self.conn:
+            self.conn.execute("UPDATE page_cache SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    def pages(self, kind: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Iterate over the cached pages.
+
+        Args:
+            kind (Optional[str]): Only return pages of this kind, 'category' or 'word'.
+
+        Yields:
+            Tuple[str, str]: (url, html) pairs.
+        """
+        query = "SELECT url, digest FROM page_cache"
+        params: Tuple[str, ...] = ()
+        if kind is not None:
+            query += " WHERE kind = ?"
+            params = (kind,)
+        for url, digest in self.conn.execute(query + " ORDER BY rowid", params).fetchall():
+            yield url, self.content(digest)
+
+    def prune(self) -> int:
+        """
+        Delete the blobs no URL points at any more.
+
+        Returns:
+            int: The number of deleted blobs.
+        """
+        with self.conn:
+            cursor = self.conn.execute("DELETE FROM page_blobs WHERE digest NOT IN (SELECT digest FROM page_cache)")
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self.conn.close()
@@ -0,0 +1,159 @@
+"""
+pipeline.py: The parse and write stages of the EtymoAgent ingestion pipeline.
+
+The crawler's fetch workers used to parse every word page on the event loop and insert its rows before
+fetching the next page, so the CPU-bound HTML parsing stalled the network I/O. ParsePipeline decouples the
+stages: fetchers hand the raw HTML to submit(), a ProcessPoolExecutor of parser workers extracts the rows on
+all cores, and the rows are queued on the single WordWriter. Each stage applies backpressure to the previous
+one: submit() waits while max_pending pages are being parsed, and a parsed page waits for room in the
+writer's bounded queue.
+
+With mark_done, the URL of every page is handed to the writer with its rows, so the page is marked done in
+the crawl queue only once its rows are committed, and a page that fails to parse is marked failed, as a page
+that fails to fetch is, so a resumed crawl retries it.
+
+The pipeline records how many pages and rows went through each stage and how long they took, so the
+throughput of every stage, and the time spent waiting on the next one, can be reported.
+
+Modules used:
+- asyncio: For feeding the stages from the crawler's event loop.
+- concurrent.futures: For the parser process pool.
+"""
+
+import asyncio
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from data.schema import Row
+from data.writer import WordWriter
+
+
+def _timed_parse(parse: Callable[[str], List[Row]], html_content: str) -> Tuple[List[Row], float]:
+    """
+    Parse a page in a worker process and measure how long it took.
+
+    Args:
+        parse (Callable[[str], List[Row]]): The page parser.
+        html_content (str): The page HTML.
+
+    Returns:
+        Tuple[List[Row], float]: The extracted rows and the parse time in seconds.
+    """
+    start = time.perf_counter()
+    rows = parse(html_content)
+    return rows, time.perf_counter() - start
+
+
+class ParsePipeline:
+    """
+    Process-pool parse stage feeding a WordWriter.
+
+    Attributes:
+        stats (Dict[str, float]): Counters of submitted, parsed and failed pages, written rows, the total parse
+            time in the workers and the time spent waiting on the writer.
+    """
+
+    def __init__(self, parse: Callable[[str], List[Row]], writer: WordWriter, n_workers: Optional[int] = None,
+                 max_pending: Optional[int] = None, mark_done: bool = False) -> None:
+        """
+        Args:
+            parse (Callable[[str], List[Row]]): Module-level function extracting the rows of a page; it is
+                pickled to the worker processes.
+            writer (WordWriter): The writer the extracted rows are queued on.
+            n_workers (Optional[int]): Number of parser processes; defaults to the number of CPUs.
+            max_pending (Optional[int]): Maximum number of pages submitted but not yet written; defaults to
+                twice the number of workers.
+            mark_done (bool): Have the writer mark the URL of each page done in the crawl queue when its rows
+                are committed, or failed when the page cannot be parsed.
+        """
+        self.parse = parse
+        self.writer = writer
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.n_workers
+        self.mark_done = mark_done
+        self.stats: Dict[str, float] = defaultdict(float)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._start_time = 0.0
+
+    async def __aenter__(self) -> 'ParsePipeline':
+        self._executor = ProcessPoolExecutor(max_workers=self.n_workers)
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._start_time = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.drain()
+        self._executor.shutdown()
+        self.stats['elapsed'] = time.perf_counter() - self._start_time
+
+    async def submit(self, url: str, html_content: str) -> None:
+        """
+        Hand a page to the parse stage, waiting while the stage is full.
+
+        Args:
+            url (str): The URL of the page.
+            html_content (str): The page HTML.
+        """
+        await self._slots.acquire()
+        self.stats['submitted'] += 1
+        task = asyncio.ensure_future(self._parse_and_write(url, html_content))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _parse_and_write(self, url: str, html_content: str) -> None:
+        """
+        Parse a page in the process pool and queue its rows on the writer.
+
+        Args:
+            url (str): The URL of the page.
+            html_content (str): The page HTML.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            rows, parse_seconds = await loop.run_in_executor(self._executor, _timed_parse, self.parse, html_content)
+            self.stats['parsed'] += 1
+            self.stats['parse_seconds'] += parse_seconds
+            start = time.perf_counter()
+            # put_many blocks while the writer's queue is full, so it runs off the event loop
+            await loop.run_in_executor(None, self.writer.put_many, rows, url if self.mark_done else None)
+            self.stats['write_wait_seconds'] += time.perf_counter() - start
+            self.stats['rows'] += len(rows)
+        except Exception as e:
+            print(f"Error parsing URL: {url}: {e!r}")
+            self.stats['failed'] += 1
+            if self.mark_done:
+                try:
+                    await loop.run_in_executor(None, self.writer.mark_failed, url)
+                except RuntimeError as error:
+                    # The writer is down; the page stays in progress and is retried by a resumed crawl
+                    print(f"Error marking URL failed: {url}: {error!r}")
+        finally:
+            self._slots.release()
+
+    async def drain(self) -> None:
+        """
+        Wait until every submitted page has been parsed and queued on the writer.
+        """
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks))
+
+    def report(self) -> str:
+        """
+        Summarize the throughput of the parse and write stages.
+
+        Returns:
+            str: One line per stage.
+        """
+        elapsed = self.stats['elapsed'] or time.perf_counter() - self._start_time
+        parsed = self.stats['parsed']
+        parse_seconds = self.stats['parse_seconds']
+        return (f"Parse: {int(parsed)} pages ({int(self.stats['failed'])} failed) on {self.n_workers} workers, "
+                f"{parsed / elapsed if elapsed else 0:.1f} pages/s, "
+                f"{parse_seconds * 1000 / parsed if parsed else 0:.2f} ms per page\n"
+                f"Write: {int(self.stats['rows'])} rows queued, {self.stats['write_wait_seconds']:.2f} s waiting "
+                f"on the writer, {self.writer.rows_written} rows in {self.writer.batches_written} batches written, "
+                f"{self.writer.rows_skipped} rows without meanings skipped")
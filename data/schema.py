@@ -0,0 +1,194 @@
+"""
+schema.py: The schema of the EtymoAgent `words` table and the statements that write to it.
+
+Words are unique: a UNIQUE index on `word` replaces the duplicate removal clean_data used to run after every
+crawl, and makes lookups by word index seeks instead of table scans. Rows are normalized before they are
+written, the same way clean_data cleans them: a meaning longer than MAX_MEANING_LENGTH characters or empty
+becomes NULL, and a row left without any meaning is not written. Inserts keep the first row of a word, and
+upserts, used when refreshing, replace the row of a word whose contents changed.
+
+Every inserted or changed row is flagged as dirty, so an incremental clean only has to look at the rows
+written since the last one.
+
+The database is switched to WAL mode when the schema is created, so the crawler's queue and the batched
+writer can use their own connections to it at the same time.
+
+Triggers count every change to the contents of the table in `words_generation`, next to a random id drawn
+when the counter is created, so a reader can tell whether anything it derived from the table, such as a
+lexicon snapshot, is still current with a single-row query, even after the database was deleted and rebuilt
+with the counter starting over.
+
+Modules used:
+- sqlite3: For interacting with the SQLite database.
+"""
+
+import sqlite3
+from typing import Optional, Tuple
+
+MAX_MEANING_LENGTH = 200
+
+# Seconds a connection waits for another one to release its lock before failing with "database is locked"
+BUSY_TIMEOUT = 30.0
+
+Row = Tuple[str, str, Optional[str], Optional[str], Optional[str]]
+
+CREATE_WORDS_SQL = '''
+    CREATE TABLE IF NOT EXISTS words (
+        id INTEGER PRIMARY KEY,
+        word TEXT NOT NULL,
+        origin_language TEXT NOT NULL,
+        noun TEXT,
+        adj TEXT,
+        verb TEXT,
+        dirty INTEGER NOT NULL DEFAULT 1
+    )
+'''
+
+# Keep the first row of a word, as clean_data's duplicate removal did
+INSERT_WORD_SQL = '''
+    INSERT INTO words (word, origin_language, noun, adj, verb)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(word) DO NOTHING
+'''
+
+# Replace the row of a word if any of its values changed
+UPSERT_WORD_SQL = '''
+    INSERT INTO words (word, origin_language, noun, adj, verb)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(word) DO UPDATE SET
+        origin_language = excluded.origin_language,
+        noun = excluded.noun,
+        adj = excluded.adj,
+        verb = excluded.verb,
+        dirty = 1
+    WHERE words.origin_language IS NOT excluded.origin_language
+        OR words.noun IS NOT excluded.noun
+        OR words.adj IS NOT excluded.adj
+        OR words.verb IS NOT excluded.verb
+'''
+
+
+CREATE_GENERATION_SQL = '''
+    CREATE TABLE IF NOT EXISTS words_generation (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        database_id TEXT,
+        generation INTEGER NOT NULL
+    )
+'''
+
+# Bumped by every insert, delete and content update of the words table; updates of the dirty flag only do not count
+GENERATION_SQL = [
+    "INSERT OR IGNORE INTO words_generation (id, database_id, generation) VALUES (0, lower(hex(randomblob(16))), 0)",
+    '''
+    CREATE TRIGGER IF NOT EXISTS words_generation_insert AFTER INSERT ON words
+    BEGIN UPDATE words_generation SET generation = generation + 1; END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS words_generation_delete AFTER DELETE ON words
+    BEGIN UPDATE words_generation SET generation = generation + 1; END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS words_generation_update
+    AFTER UPDATE OF id, word, origin_language, noun, adj, verb ON words
+    BEGIN UPDATE words_generation SET generation = generation + 1; END
+    ''',
+]
+
+
+def ensure_generation_counter(conn: sqlite3.Connection) -> None:
+    """
+    Create the `words_generation` counter and the triggers maintaining it, if needed.
+
+    A counter created before it had a database id is given one.
+
+    Args:
+        conn (sqlite3.Connection): The connection object to the SQLite database.
+    """
+    with conn:
+        conn.execute(CREATE_GENERATION_SQL)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(words_generation)")}
+        if 'database_id' not in columns:
+            conn.execute("ALTER TABLE words_generation ADD COLUMN database_id TEXT")
+        for statement in GENERATION_SQL:
+            conn.execute(statement)
+        conn.execute("UPDATE words_generation SET database_id = lower(hex(randomblob(16))) WHERE database_id IS NULL")
+
+
+def words_generation(conn: sqlite3.Connection) -> Optional[Tuple[str, int]]:
+    """
+    Return the id of the database and the number of changes made to its `words` table since the generation
+    counter was created.
+
+    Args:
+        conn (sqlite3.Connection): The connection object to the SQLite database.
+
+    Returns:
+        Optional[Tuple[str, int]]: The database id and the generation, or None if the database has no
+        generation counter.
+    """
+    try:
+        row = conn.execute("SELECT database_id, generation FROM words_generation WHERE id = 0").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return (row[0], row[1]) if row and row[0] is not None else None
+
+
+def ensure_words_schema(conn: sqlite3.Connection) -> None:
+    """
+    Switch the database to WAL mode and create the `words` table, its indexes and its generation counter,
+    migrating a table created before they existed.
+
+    Call it before other connections to the database are opened: switching to WAL mode fails while another
+    connection holds a lock, and is a no-op once the database is in WAL mode.
+
+    Existing duplicates are removed, keeping the first row of each word, before the UNIQUE index is created.
+
+    Args:
+        conn (sqlite3.Connection): The connection object to the SQLite database.
+    """
+    conn.execute('PRAGMA journal_mode=WAL')
+    with conn:
+        conn.execute(CREATE_WORDS_SQL)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(words)")}
+        if 'dirty' not in columns:
+            conn.execute("ALTER TABLE words ADD COLUMN dirty INTEGER NOT NULL DEFAULT 1")
+        has_unique_index = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_words_word'").fetchone()
+        if not has_unique_index:
+            conn.execute("DELETE FROM words WHERE id NOT IN (SELECT MIN(id) FROM words GROUP BY word)")
+            conn.execute("CREATE UNIQUE INDEX idx_words_word ON words(word)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_words_dirty ON words(dirty) WHERE dirty = 1")
+    ensure_generation_counter(conn)
+
+
+def normalize_meaning(meaning: Optional[str]) -> Optional[str]:
+    """
+    Normalize a meaning the way clean_data does.
+
+    Args:
+        meaning (Optional[str]): The meaning text.
+
+    Returns:
+        Optional[str]: None if the meaning is missing, empty or longer than MAX_MEANING_LENGTH characters,
+        otherwise the meaning.
+    """
+    if not meaning or len(meaning) > MAX_MEANING_LENGTH:
+        return None
+    return meaning
+
+
+def normalize_row(row: Row) -> Optional[Row]:
+    """
+    Normalize the meanings of a row before it is written.
+
+    Args:
+        row (Row): (word, origin_language, noun, adj, verb).
+
+    Returns:
+        Optional[Row]: The normalized row, or None if it has no meaning left and should not be written.
+    """
+    word, origin_language, noun, adj, verb = row
+    noun, adj, verb = normalize_meaning(noun), normalize_meaning(adj), normalize_meaning(verb)
+    if noun is None and adj is None and verb is None:
+        return None
+    return word, origin_language, noun, adj, verb
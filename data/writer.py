@@ -0,0 +1,213 @@
+"""
+writer.py: A batched, single-connection writer for the EtymoAgent `words` table.
+
+insert_word opens a connection, inserts one row and commits for every etymology pair, so ingestion spends
+most of its time in per-row commits and fsyncs. WordWriter instead owns one connection in a background
+thread, uses a relaxed synchronous level on the WAL database, and writes buffered rows with
+executemany in one transaction per batch. A batch is flushed when it reaches batch_size rows or when
+flush_interval seconds have passed since the last flush.
+
+Rows are handed over through a bounded thread-safe queue, so any number of crawler workers or threads can
+feed the single writer, and producers block when the writer falls behind. The writer normalizes the rows
+before writing them, and rows of words already in the table are ignored, or replaced if they changed when the writer
+upserts.
+
+Rows can be handed over together with the URL of the page they were extracted from. The writer marks that URL
+done in the crawler's `crawl_queue` table in the same transaction as the rows, so a crawl interrupted while
+rows were still buffered resumes from exactly the pages whose rows were not committed. A page that could not
+be parsed is marked failed the same way, so a resumed crawl retries it.
+
+Modules used:
+- sqlite3: For interacting with the SQLite database.
+- threading, queue: For the writer thread and its input queue.
+- data.schema: For the insert statements and row normalization.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, NamedTuple, Optional
+from data.schema import BUSY_TIMEOUT, INSERT_WORD_SQL, UPSERT_WORD_SQL, Row, ensure_words_schema, normalize_row
+
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+# Sentinel telling the writer thread to flush and stop
+_STOP = object()
+
+MARK_SQL = "UPDATE crawl_queue SET status = ? WHERE url = ?"
+
+
+class _Mark(NamedTuple):
+    """
+    Queue item setting the crawl status of a URL, 'done' once the rows preceding it are committed.
+    """
+    url: str
+    status: str
+
+
+class WordWriter:
+    """
+    Background writer inserting rows into the `words` table in batches.
+
+    Attributes:
+        rows_written (int): Number of rows committed so far, including rows ignored as duplicates.
+        rows_skipped (int): Number of rows left without any meaning by normalization, and not written.
+        batches_written (int): Number of transactions committed so far.
+        urls_done (int): Number of crawled URLs marked done so far.
+        urls_failed (int): Number of crawled URLs marked failed so far.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 500, flush_interval: float = 1.0,
+                 synchronous: str = 'NORMAL', max_queue: int = 10000, upsert: bool = False) -> None:
+        """
+        Start the writer thread.
+
+        Args:
+            db_path (str): Path of the SQLite database.
+            batch_size (int): Number of rows written per transaction.
+            flush_interval (float): Maximum number of seconds a row waits in the buffer.
+            synchronous (str): SQLite synchronous level, one of SYNCHRONOUS_LEVELS.
+            max_queue (int): Maximum number of rows waiting in the queue before producers block.
+            upsert (bool): Replace the row of a word already in the table if it changed, instead of
+                keeping the first one.
+
+        Raises:
+            ValueError: If the synchronous level is unknown.
+        """
+        if synchronous.upper() not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"Unknown synchronous level '{synchronous}', expected one of {SYNCHRONOUS_LEVELS}")
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous.upper()
+        self.sql = UPSERT_WORD_SQL if upsert else INSERT_WORD_SQL
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.batches_written = 0
+        self.urls_done = 0
+        self.urls_failed = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name='WordWriter', daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> 'WordWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def put(self, row: Row) -> None:
+        """
+        Queue one row for insertion.
+
+        Args:
+            row (Row): (word, origin_language, noun, adj, verb).
+
+        Raises:
+            RuntimeError: If the writer thread has failed.
+        """
+        if self._error is not None:
+            raise RuntimeError("WordWriter failed") from self._error
+        self._queue.put(row)
+
+    def put_many(self, rows: Iterable[Row], done_url: Optional[str] = None) -> None:
+        """
+        Queue several rows for insertion.
+
+        Args:
+            rows (Iterable[Row]): (word, origin_language, noun, adj, verb) rows.
+            done_url (Optional[str]): URL of the page the rows come from, marked done in the `crawl_queue`
+                table when they are committed.
+        """
+        for row in rows:
+            self.put(row)
+        if done_url is not None:
+            self.put(_Mark(done_url, 'done'))
+
+    def mark_failed(self, url: str) -> None:
+        """
+        Queue marking a crawled URL failed in the `crawl_queue` table, for example because its page could not
+        be parsed.
+
+        Args:
+            url (str): The URL.
+
+        Raises:
+            RuntimeError: If the writer thread has failed.
+        """
+        self.put(_Mark(url, 'failed'))
+
+    def pending(self) -> int:
+        """
+        Return the approximate number of rows waiting in the queue.
+
+        Returns:
+            int: The queue size.
+        """
+        return self._queue.qsize()
+
+    def close(self) -> None:
+        """
+        Flush the remaining rows and stop the writer thread.
+
+        Raises:
+            RuntimeError: If the writer thread has failed.
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        if self._error is not None:
+            raise RuntimeError("WordWriter failed") from self._error
+
+    def _run(self) -> None:
+        conn: Optional[sqlite3.Connection] = None
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT)
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            ensure_words_schema(conn)
+            buffer: List[Row] = []
+            marks: List[_Mark] = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    item = None
+                if item is _STOP:
+                    self._flush(conn, buffer, marks)
+                    break
+                if isinstance(item, _Mark):
+                    marks.append(item)
+                elif item is not None:
+                    row = normalize_row(item)
+                    if row is None:
+                        self.rows_skipped += 1
+                    else:
+                        buffer.append(row)
+                if len(buffer) >= self.batch_size or time.monotonic() >= deadline:
+                    self._flush(conn, buffer, marks)
+                    buffer, marks = [], []
+                    deadline = time.monotonic() + self.flush_interval
+        except BaseException as e:
+            print(f"Error writing words: {e}")
+            self._error = e
+            # Keep draining so producers blocked on a full queue are released
+            while True:
+                if self._queue.get() is _STOP:
+                    break
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _flush(self, conn: sqlite3.Connection, buffer: List[Row], marks: List[_Mark]) -> None:
+        if not buffer and not marks:
+            return
+        with conn:
+            conn.executemany(self.sql, buffer)
+            conn.executemany(MARK_SQL, [(mark.status, mark.url) for mark in marks])
+        self.rows_written += len(buffer)
+        self.urls_done += sum(mark.status == 'done' for mark in marks)
+        self.urls_failed += sum(mark.status == 'failed' for mark in marks)
+        self.batches_written += 1
@@ -6,11 +6,13 @@ Modules used:
 - sqlite3: For connecting to and querying the SQLite database.
 - pandas: For data manipulation and analysis.
 - numpy: For numerical operations.
+- scipy.sparse: For keeping the character n-gram features sparse.
 - gensim.models.KeyedVectors: For loading and using pre-trained Word2Vec models.
 - sklearn.feature_extraction.text.CountVectorizer: For extracting character n-grams.
 - sklearn.ensemble.RandomForestClassifier: For creating and training the RandomForest classifier.
 - sklearn.model_selection.train_test_split: For splitting the data into training and testing sets.
 - sklearn.metrics: For evaluating the performance of the model.
+- models.lexicon: For the compact lexicon used by the orthographic lookups.
 """
 
 import sqlite3
@@ -19,15 +21,27 @@ import numpy as np
 import sys
 import json
 import os
-from typing import Tuple
-import Levenshtein 
-import scipy
+from concurrent.futures import ProcessPoolExecutor
+from scipy import sparse
 from gensim.models import KeyedVectors
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
-from typing import Tuple, List
+from typing import Tuple, List, Dict, Any, Optional, Sequence, Union
+
+# Make the project packages importable when this file is run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.bktree import BKTree
+from models.ngram_index import QGramIndex, brute_force_nearest
+from models.symspell import SymSpellIndex
+from models.vectors import PRETRAINED_BIN, PRETRAINED_KV, LEXICON_VECTORS_DIR, VectorTable
+from models.lexicon import Lexicon
+
+WordIndex = Union[BKTree, QGramIndex, SymSpellIndex]
+MATCHERS = ['scan', 'bktree', 'qgram', 'symspell']
+WordVectors = Union[KeyedVectors, VectorTable]
 
 def calculate_accuracy(predictions: list, true_origins: list) -> float:
     """
@@ -63,6 +77,8 @@ def evaluate_model(df: pd.DataFrame):
     """
     Evaluate the orthographic similarity model.
 
+    The test words are predicted in chunks across a process pool with predict_origins.
+
     Args:
         df (pd.DataFrame): DataFrame containing the words and their origin languages.
 
@@ -74,13 +90,10 @@ def evaluate_model(df: pd.DataFrame):
 
     # Prepare lists to store true origins and predictions
     true_origins = test_df['origin_language'].tolist()
-    predictions = []
 
-    # Predict origins for the test set
-    for _, row in test_df.iterrows():
-        new_word = row['word']
-        predicted_origin, _ = predict_origin(new_word, train_df)  # Use the training set for predictions
-        predictions.append(predicted_origin)
+    # Predict origins for the test set in batches, using the training set as the lexicon
+    lexicon = Lexicon.from_dataframe(train_df)
+    predictions = [origin for _, origin in predict_origins(test_df['word'].tolist(), lexicon)]
 
     # Calculate accuracy
     accuracy = calculate_accuracy(predictions, true_origins)
@@ -123,11 +136,32 @@ def load_and_prepare_data(db_name: str) -> pd.DataFrame:
     return df
 
 
+def load_lexicon(db_name: str) -> Lexicon:
+    """
+    Load the compact lexicon used for lookups from the SQLite database.
+
+    Args:
+        db_name (str): The name of the database file.
+
+    Returns:
+        Lexicon: The lower-cased words and their origin languages; meanings are read on demand.
+    """
+    data_path = os.path.join(os.environ.get("ETYMOAGENT"), 'data')
+    return Lexicon.from_database(os.path.join(data_path, db_name))
+
+
 # Load pre-trained Word2Vec model
-def load_pretrained_word2vec() -> KeyedVectors:
+def load_pretrained_word2vec(mmap: bool = True) -> KeyedVectors:
     """
     Load the pre-trained Word2Vec model.
 
+    The native KeyedVectors file written by `python3 models/vectors.py convert` is preferred: it is opened
+    with mmap, so loading is near-instant and worker processes share the vector matrix through the page
+    cache. Without it, the word2vec binary is parsed, which takes minutes.
+
+    Args:
+        mmap (bool): Whether to memory-map the native model instead of reading it into memory.
+
     Returns:
         KeyedVectors: Loaded Word2Vec model.
     
@@ -136,13 +170,25 @@ def load_pretrained_word2vec() -> KeyedVectors:
         Exception: For any other errors during model loading.
     """
     models_path = os.path.join(os.environ.get("ETYMOAGENT"), 'models')
-    path_to_pretrained = os.path.join(models_path, "GoogleNews-vectors-negative300.bin")
+    path_to_native = os.path.join(models_path, PRETRAINED_KV)
+    path_to_pretrained = os.path.join(models_path, PRETRAINED_BIN)
+
+    if os.path.isfile(path_to_native):
+        try:
+            print(f"Loading Word2Vec model from {path_to_native}...")
+            model = KeyedVectors.load(path_to_native, mmap='r' if mmap else None)
+            print("Word2Vec model loaded successfully.")
+            return model
+        except Exception as e:
+            print(f"An error occurred while loading the Word2Vec model: {e}")
+            raise
     
     if not os.path.isfile(path_to_pretrained):
         raise FileNotFoundError(f"Pre-trained Word2Vec model not found at {path_to_pretrained}")
 
     try:
         print(f"Loading Word2Vec model from {path_to_pretrained}...")
+        print("Run `python3 models/vectors.py convert` once to make this load near-instant.")
         model = KeyedVectors.load_word2vec_format(path_to_pretrained, binary=True)
         print("Word2Vec model loaded successfully.")
         return model
@@ -151,27 +197,46 @@ def load_pretrained_word2vec() -> KeyedVectors:
         raise
 
 
+def load_word_vectors() -> WordVectors:
+    """
+    Load the word vectors used for semantic features.
+
+    The compact lexicon table built by `python3 models/vectors.py subset` is preferred, since it only holds
+    the vectors extract_semantic_features can look up. Otherwise the full pre-trained model is loaded.
+
+    Returns:
+        WordVectors: The lexicon vector table, or the full Word2Vec model.
+    """
+    models_path = os.path.join(os.environ.get("ETYMOAGENT"), 'models')
+    subset_dir = os.path.join(models_path, LEXICON_VECTORS_DIR)
+    if os.path.isfile(os.path.join(subset_dir, 'vectors.npy')):
+        print(f"Loading lexicon word vectors from {subset_dir}...")
+        return VectorTable.load(subset_dir)
+    return load_pretrained_word2vec()
+
+
 # Extract semantic features using Word2Vec
-def extract_semantic_features(df: pd.DataFrame, word2vec_model: KeyedVectors) -> List[np.ndarray]:
+def extract_semantic_features(df: pd.DataFrame, word2vec_model: WordVectors) -> np.ndarray:
     """
     Extract semantic features using the Word2Vec model.
     
     Args:
         df (pd.DataFrame): DataFrame containing the words.
-        word2vec_model (KeyedVectors): Pre-trained Word2Vec model.
+        word2vec_model (WordVectors): Pre-trained Word2Vec model or the lexicon vector table.
     
     Returns:
-        List[np.ndarray]: List of word vectors.
+        np.ndarray: float32 array with one word vector per row; words without a vector are all zeros.
     """
-    def get_word_vector(word: str) -> np.ndarray:
-        return word2vec_model[word] if word in word2vec_model else np.zeros(300)  # 300 is the vector size of the Word2Vec model
-
-    df['word_vector'] = df['word'].apply(get_word_vector)
-    return df['word_vector'].values.tolist()
+    # Fill a preallocated matrix instead of stacking a list of per-word arrays
+    vectors = np.zeros((len(df), word2vec_model.vector_size), dtype=np.float32)
+    for row, word in enumerate(df['word']):
+        if word in word2vec_model:
+            vectors[row] = word2vec_model[word]
+    return vectors
 
 
 # Extract orthographic features using character n-grams
-def extract_orthographic_features(df: pd.DataFrame) -> Tuple[np.ndarray, CountVectorizer]:
+def extract_orthographic_features(df: pd.DataFrame) -> Tuple[sparse.csr_matrix, CountVectorizer]:
     """
     Extract orthographic features using character n-grams.
     
@@ -179,28 +244,31 @@ def extract_orthographic_features(df: pd.DataFrame) -> Tuple[np.ndarray, CountVe
         df (pd.DataFrame): DataFrame containing the words.
     
     Returns:
-        Tuple[np.ndarray, CountVectorizer]: Array of orthographic features and the vectorizer.
+        Tuple[sparse.csr_matrix, CountVectorizer]: Sparse matrix of orthographic features and the vectorizer.
     """
-    vectorizer = CountVectorizer(analyzer='char', ngram_range=(1, 3))
-    X_char_ngrams = vectorizer.fit_transform(df['word']).toarray()
+    vectorizer = CountVectorizer(analyzer='char', ngram_range=(1, 3), dtype=np.float32)
+    X_char_ngrams = vectorizer.fit_transform(df['word'])
     return X_char_ngrams, vectorizer
 
 
 # Combine semantic and orthographic features
-def combine_features(df: pd.DataFrame, word2vec_model: KeyedVectors) -> Tuple[np.ndarray, pd.Series, CountVectorizer]:
+def combine_features(df: pd.DataFrame, word2vec_model: WordVectors) -> Tuple[sparse.csr_matrix, pd.Series, CountVectorizer]:
     """
     Combine semantic and orthographic features.
+
+    The character n-gram counts stay sparse, so memory grows with the number of n-grams each word actually
+    has rather than with the full n-gram vocabulary.
     
     Args:
         df (pd.DataFrame): DataFrame containing the words.
-        word2vec_model (KeyedVectors): Pre-trained Word2Vec model.
+        word2vec_model (WordVectors): Pre-trained Word2Vec model or the lexicon vector table.
     
     Returns:
-        Tuple[np.ndarray, pd.Series, CountVectorizer]: Combined feature array, target labels, and the vectorizer.
+        Tuple[sparse.csr_matrix, pd.Series, CountVectorizer]: Combined sparse feature matrix, target labels, and the vectorizer.
     """
     semantic_features = extract_semantic_features(df, word2vec_model)
     orthographic_features, vectorizer = extract_orthographic_features(df)
-    X = np.hstack((semantic_features, orthographic_features))
+    X = sparse.hstack((sparse.csr_matrix(semantic_features), orthographic_features), format='csr', dtype=np.float32)
     y = df['origin_language']
     return X, y, vectorizer
 
@@ -217,13 +285,13 @@ def initialize_model() -> RandomForestClassifier:
     return clf
 
 
-def train_and_evaluate_model(clf: RandomForestClassifier, X: np.ndarray, y: pd.Series) -> RandomForestClassifier:
+def train_and_evaluate_model(clf: RandomForestClassifier, X: sparse.csr_matrix, y: pd.Series) -> RandomForestClassifier:
     """
     Train and evaluate the RandomForestClassifier model.
     
     Args:
         clf (RandomForestClassifier): RandomForestClassifier model.
-        X (np.ndarray): Feature array.
+        X (sparse.csr_matrix): Feature matrix.
         y (pd.Series): Target labels.
     
     Returns:
@@ -238,38 +306,165 @@ def train_and_evaluate_model(clf: RandomForestClassifier, X: np.ndarray, y: pd.S
 
 
 # Step 5: Prediction
-def predict_origin(new_word: str, df: pd.DataFrame) -> Tuple[str, str]:
+def build_word_index(words: Sequence[str], matcher: str = 'qgram', max_distance: int = 2) -> Optional[WordIndex]:
+    """
+    Build the nearest-word index used by predict_origin.
+
+    Args:
+        words (Sequence[str]): The lexicon words, in row order, such as a Lexicon.
+        matcher (str): One of MATCHERS. 'scan' builds no index and compares against every row.
+        max_distance (int): The largest edit distance the 'symspell' matcher resolves; queries with no
+            word that close fall back to the full scan. Memory grows quickly with this value, see
+            SymSpellIndex.memory_usage().
+
+    Returns:
+        Optional[WordIndex]: The index, or None for 'scan'.
+
+    Raises:
+        ValueError: If the matcher is unknown.
+    """
+    if matcher == 'scan':
+        return None
+    if matcher == 'bktree':
+        return BKTree(words)
+    if matcher == 'qgram':
+        return QGramIndex(words)
+    if matcher == 'symspell':
+        index = SymSpellIndex(words, max_distance=max_distance)
+        print(f"SymSpell dictionary memory usage: {index.memory_usage()}")
+        return index
+    raise ValueError(f"Unknown matcher '{matcher}', expected one of {MATCHERS}")
+
+
+def predict_origin(new_word: str, lexicon: Lexicon, word_index: Optional[WordIndex] = None) -> Tuple[str, str, float, str, str, str]:
     """
     Predict the origin of the new word based on orthographic similarity.
 
     Args:
         new_word (str): The new word to predict.
-        df (pd.DataFrame): DataFrame containing the words and their origin languages.
+        lexicon (Lexicon): The lexicon words and their origin languages.
+        word_index (Optional[WordIndex]): Index built over the lexicon. When given, the closest word is
+            found through the index instead of scanning every row. If the index finds no match (a SymSpell
+            dictionary with nothing within its max distance), every row is scanned.
 
     Returns:
-        Tuple[str, str]: The predicted origin and the most similar word.
-    """
-    # Initialize variables
-    closest_word = None
-    min_distance = float('inf')
-    predicted_origin = None
-
-    # Iterate over words in the DataFrame to find the closest match
-    for index, row in df.iterrows():
-        word = row['word']
-        origin_language = row['origin_language']
-        distance = Levenshtein.distance(new_word, word)
-        
-        if distance < min_distance:
-            min_distance = distance
-            closest_word = word
-            predicted_origin = origin_language
-            noun_meaning = row['noun']
-            adj_meaning = row['adj']
-            verb_meaning = row['verb']
-            similarity_score = 1 - min_distance / max(len(new_word), len(closest_word)) 
+        Tuple[str, str, float, str, str, str]: The most similar word, the predicted origin, the similarity
+        score and the noun, adjective and verb meanings of the most similar word; all None if the lexicon
+        is empty.
+    """
+    match = word_index.nearest(new_word) if word_index is not None else None
+    if match is None:
+        # Iterate over words in the lexicon to find the closest match
+        match = brute_force_nearest(new_word, lexicon)
+    if match is None:
+        return None, None, None, None, None, None
+
+    row_id, min_distance = match
+    closest_word = lexicon[row_id]
+    similarity_score = 1 - min_distance / max(len(new_word), len(closest_word))
+    # Only the meanings of the closest word are read from the database
+    noun_meaning, adj_meaning, verb_meaning = lexicon.meanings(row_id)
+    return closest_word, lexicon.origin(row_id), similarity_score, noun_meaning, adj_meaning, verb_meaning
+
+
+# Lexicon state of a predict_origins worker process, set up once by _init_batch_worker
+_batch_words: Sequence[str] = []
+_batch_index: Optional[WordIndex] = None
+
+
+def _init_batch_worker(lexicon: Lexicon, matcher: str) -> None:
+    """
+    Build the nearest-word index once in a predict_origins worker process.
+
+    Args:
+        lexicon (Lexicon): The lexicon, sent to the worker as its compact columns.
+        matcher (str): The kind of nearest-word index to build, one of MATCHERS.
+    """
+    global _batch_words, _batch_index
+    _batch_words = lexicon
+    _batch_index = build_word_index(lexicon, matcher)
+
+
+def _predict_chunk(queries: List[str]) -> List[Tuple[int, int]]:
+    """
+    Find the closest lexicon row for each query of a chunk.
+
+    Args:
+        queries (List[str]): The words to look up.
+
+    Returns:
+        List[Tuple[int, int]]: The row id of the closest word and its distance, per query.
+    """
+    results = []
+    for query in queries:
+        match = _batch_index.nearest(query) if _batch_index is not None else None
+        if match is None:
+            match = brute_force_nearest(query, _batch_words)
+        results.append(match)
+    return results
+
 
-    return closest_word, predicted_origin, similarity_score, noun_meaning, adj_meaning, verb_meaning
+def predict_origins(new_words: List[str], lexicon: Lexicon, matcher: str = 'qgram',
+                    chunk_size: int = 1000, n_jobs: Optional[int] = None) -> List[Tuple[str, str]]:
+    """
+    Predict the origins of many words at once based on orthographic similarity.
+
+    The queries are split into chunks of chunk_size and spread across a process pool. Each worker builds
+    the nearest-word index over the lexicon once and only sends back row ids and distances, so memory stays
+    bounded by the chunk size rather than the number of queries times the lexicon size.
+
+    Args:
+        new_words (List[str]): The words to predict.
+        lexicon (Lexicon): The lexicon words and their origin languages.
+        matcher (str): The kind of nearest-word index the workers build, one of MATCHERS.
+        chunk_size (int): Number of queries sent to a worker at a time.
+        n_jobs (Optional[int]): Number of worker processes; defaults to the number of CPUs. With 1, the
+            queries are answered in this process.
+
+    Returns:
+        List[Tuple[str, str]]: The most similar word and the predicted origin for each query, in order.
+    """
+    chunks = [new_words[i:i + chunk_size] for i in range(0, len(new_words), chunk_size)]
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    if n_jobs == 1 or len(chunks) <= 1:
+        _init_batch_worker(lexicon, matcher)
+        chunk_results = map(_predict_chunk, chunks)
+        matches = [match for chunk in chunk_results for match in chunk]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks)), initializer=_init_batch_worker,
+                                 initargs=(lexicon, matcher)) as executor:
+            matches = [match for chunk in executor.map(_predict_chunk, chunks) for match in chunk]
+
+    return [(lexicon[row_id], lexicon.origin(row_id)) for row_id, _ in matches]
+
+
+def build_result(closest_word: str, predicted_origin: str, similarity_score: float,
+                 noun_meaning: str, adj_meaning: str, verb_meaning: str) -> Optional[Dict[str, Any]]:
+    """
+    Build the result dictionary returned to the web application.
+
+    Args:
+        closest_word (str): The most similar word in the database.
+        predicted_origin (str): The predicted origin language.
+        similarity_score (float): Similarity between the new word and the closest word.
+        noun_meaning (str): The noun meaning of the closest word.
+        adj_meaning (str): The adjective meaning of the closest word.
+        verb_meaning (str): The verb meaning of the closest word.
+
+    Returns:
+        Optional[Dict[str, Any]]: The result dictionary, or None if no match was found.
+    """
+    if not (predicted_origin and closest_word):
+        return None
+    return {
+        "most_similar_word": closest_word,
+        "similarity_score": similarity_score,
+        "origin_language": predicted_origin,
+        "noun_meaning": noun_meaning,
+        "adj_meaning": adj_meaning,
+        "verb_meaning": verb_meaning
+    }
 
 
 def main(db_name: str, new_word: str) -> None:
@@ -280,25 +475,12 @@ def main(db_name: str, new_word: str) -> None:
         db_name (str): The name of the database file.
         new_word (str): The new word to predict.
     """
-    df = load_and_prepare_data(db_name)
-    assert isinstance(df, pd.DataFrame), "The result should be a Pandas DataFrame."
-    assert 'word' in df.columns, "The DataFrame should contain a 'word' column."
-    assert 'origin_language' in df.columns, "The DataFrame should contain an 'origin_language' column."
-    assert 'noun' in df.columns, "The DataFrame should contain a 'noun' column."
-    assert 'adj' in df.columns, "The DataFrame should contain an 'adj' column."
-    assert 'verb' in df.columns, "The DataFrame should contain a 'verb' column."
-    assert not df.empty, "The DataFrame should not be empty."
+    lexicon = load_lexicon(db_name)
+    assert isinstance(lexicon, Lexicon), "The result should be a Lexicon."
+    assert len(lexicon) > 0, "The lexicon should not be empty."
         
-    closest_word, predicted_origin, similarity_score, noun_meaning, adj_meaning, verb_meaning = predict_origin(new_word, df)
-    if predicted_origin and closest_word:
-        output = {
-            "most_similar_word": closest_word,
-            "similarity_score": similarity_score,
-            "origin_language": predicted_origin,
-            "noun_meaning": noun_meaning,
-            "adj_meaning": adj_meaning,
-            "verb_meaning": verb_meaning
-        }
+    output = build_result(*predict_origin(new_word, lexicon))
+    if output:
         return json.dumps(output)
     else:
         print("Error getting values")
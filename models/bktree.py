@@ -0,0 +1,174 @@
+"""
+bktree.py: A BK-tree metric index over Levenshtein distance for nearest-word lookup.
+
+The tree is built once from the words of the lexicon and answers nearest-neighbour queries by
+pruning every subtree that the triangle inequality rules out, so a query compares against a
+fraction of the lexicon instead of every row. Ties are broken by the lowest row id, which makes
+the result identical to a linear scan that keeps the first word with the smallest distance.
+
+The tree is stored as flat parallel lists so that it can be pickled to disk without recursion.
+
+Modules used:
+- Levenshtein: For computing edit distances between words.
+- pickle: For serializing the tree to disk.
+- hashlib: For fingerprinting the word list the tree was built from.
+"""
+
+import hashlib
+import pickle
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import Levenshtein
+
+BKTREE_FORMAT_VERSION = 1
+
+
+def words_fingerprint(words: Iterable[str]) -> str:
+    """
+    Compute a fingerprint of an ordered word list.
+
+    Args:
+        words (Iterable[str]): The words, in row order.
+
+    Returns:
+        str: Hex digest identifying the word list.
+    """
+    digest = hashlib.sha1()
+    for word in words:
+        digest.update(word.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+class BKTree:
+    """
+    BK-tree over edit distance mapping each distinct word to the row ids it occurs at.
+
+    Attributes:
+        fingerprint (str): Fingerprint of the word list the tree was built from.
+    """
+
+    def __init__(self, words: Sequence[str] = (), distance: Callable[[str, str], int] = Levenshtein.distance) -> None:
+        """
+        Build the tree from a sequence of words.
+
+        Args:
+            words (Sequence[str]): The words to index; a word's position is its row id.
+            distance (Callable[[str, str], int]): The metric used to compare words.
+        """
+        self._distance = distance
+        self._words: List[str] = []
+        self._ids: List[List[int]] = []
+        self._children: List[Dict[int, int]] = []
+        for row_id, word in enumerate(words):
+            self.add(word, row_id)
+        self.fingerprint = words_fingerprint(words)
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._ids)
+
+    def add(self, word: str, row_id: int) -> None:
+        """
+        Insert a word into the tree.
+
+        Args:
+            word (str): The word to insert.
+            row_id (int): The row id of the word in the lexicon.
+        """
+        if not self._words:
+            self._new_node(word, row_id)
+            return
+
+        node = 0
+        while True:
+            d = self._distance(word, self._words[node])
+            if d == 0:
+                self._ids[node].append(row_id)
+                return
+            child = self._children[node].get(d)
+            if child is None:
+                self._children[node][d] = self._new_node(word, row_id)
+                return
+            node = child
+
+    def _new_node(self, word: str, row_id: int) -> int:
+        self._words.append(word)
+        self._ids.append([row_id])
+        self._children.append({})
+        return len(self._words) - 1
+
+    def nearest(self, query: str) -> Optional[Tuple[int, int]]:
+        """
+        Find the word closest to the query.
+
+        Args:
+            query (str): The word to look up.
+
+        Returns:
+            Optional[Tuple[int, int]]: The row id of the closest word and its distance,
+            or None if the tree is empty.
+        """
+        if not self._words:
+            return None
+
+        best_id, best_distance = None, float('inf')
+        # Each entry is a node and a lower bound on the distance of anything in its subtree
+        stack = [(0, 0)]
+        while stack:
+            node, lower_bound = stack.pop()
+            if lower_bound > best_distance:
+                continue
+            d = self._distance(query, self._words[node])
+            row_id = self._ids[node][0]
+            if d < best_distance or (d == best_distance and row_id < best_id):
+                best_id, best_distance = row_id, d
+
+            # Visit the most promising children last so they are popped first
+            children = sorted(self._children[node].items(), key=lambda item: -abs(item[0] - d))
+            for edge, child in children:
+                child_bound = abs(edge - d)
+                if child_bound <= best_distance:
+                    stack.append((child, child_bound))
+        return best_id, best_distance
+
+    def save(self, path: str) -> None:
+        """
+        Serialize the tree to disk.
+
+        Args:
+            path (str): The file to write the tree to.
+        """
+        state = {
+            'version': BKTREE_FORMAT_VERSION,
+            'fingerprint': self.fingerprint,
+            'words': self._words,
+            'ids': self._ids,
+            'children': self._children,
+        }
+        with open(path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str, distance: Callable[[str, str], int] = Levenshtein.distance) -> 'BKTree':
+        """
+        Load a tree previously written with save().
+
+        Args:
+            path (str): The file to read the tree from.
+            distance (Callable[[str, str], int]): The metric the tree was built with.
+
+        Returns:
+            BKTree: The loaded tree.
+
+        Raises:
+            ValueError: If the file was written by an incompatible version.
+        """
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if state.get('version') != BKTREE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported BK-tree format in {path}")
+        tree = cls(distance=distance)
+        tree.fingerprint = state['fingerprint']
+        tree._words = state['words']
+        tree._ids = state['ids']
+        tree._children = state['children']
+        return tree
@@ -0,0 +1,285 @@
+"""
+classifier.py: Persisted, versioned origin classifier bundles for EtymoAgent.
+
+Training the RandomForest origin classifier on the combined semantic and orthographic features takes a
+full training run, and nothing used to keep the fitted CountVectorizer or classifier around. A bundle saves
+everything needed to featurize and classify new words: the fitted vectorizer (with its n-gram vocabulary),
+the classifier and its label set. It is keyed by a hash of the `words` table contents, by a fingerprint of
+the word vectors it was trained with and by a format version, and train_or_load_classifier only retrains
+when one of them no longer matches. Bundles are loaded
+with joblib's mmap mode, so a warm load takes milliseconds.
+
+Training only happens offline, through the command below. A bundle also records the table signature (see
+models/snapshot.py) of the database it was trained from, so load_current_classifier can tell whether it is
+current without reading the table, and serving processes never train.
+
+predict_origin_probabilities uses a bundle in the request path: it featurizes a batch of query words with the
+stored vectorizer and the word vector table and returns class probabilities over the origin languages from a
+single predict_proba call, with the trees evaluated on the number of cores set when the bundle was loaded,
+one by default, so a single-word request does not start a worker pool. Its cost per query does not depend on
+the size of the lexicon.
+
+Usage:
+    python3 models/classifier.py [--force]
+
+Modules used:
+- joblib: For saving and memory-mapping the bundle.
+- pandas: For the lexicon DataFrame.
+- scipy.sparse: For the query feature matrix.
+- sklearn: For the vectorizer and classifier stored in the bundle.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, List, Optional
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import CountVectorizer
+
+# Make the project packages importable when this file is run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.agent import (WordVectors, load_and_prepare_data, load_word_vectors, combine_features,
+                          extract_semantic_features, initialize_model, train_and_evaluate_model)
+from data.schema import ensure_generation_counter
+from models.lexicon import lexicon_hash
+from models.snapshot import table_signature
+from models.vectors import vectors_fingerprint
+
+BUNDLE_VERSION = 3
+BUNDLE_FILE = "origin_classifier.joblib"
+
+
+class ClassifierBundle:
+    """
+    A trained origin classifier with everything needed to use it.
+
+    Attributes:
+        version (int): The bundle format version.
+        lexicon_hash (str): Hash of the lexicon the classifier was trained on.
+        vectorizer (CountVectorizer): The fitted character n-gram vectorizer.
+        classifier (RandomForestClassifier): The fitted classifier.
+        labels (List[str]): The origin languages the classifier predicts, in column order.
+        vector_size (int): Dimensionality of the semantic features the classifier was trained with.
+        vectors_fingerprint (str): Fingerprint of the word vectors the classifier was trained with.
+        table_signature (Optional[Dict[str, Any]]): The table_signature of the database the classifier was
+            trained from, None if it was trained from another source.
+    """
+
+    def __init__(self, lexicon_hash: str, vectorizer: CountVectorizer, classifier: RandomForestClassifier,
+                 vector_size: int, vectors_fingerprint: str,
+                 table_signature: Optional[Dict[str, Any]] = None) -> None:
+        self.version = BUNDLE_VERSION
+        self.lexicon_hash = lexicon_hash
+        self.vectorizer = vectorizer
+        self.classifier = classifier
+        self.labels: List[str] = list(classifier.classes_)
+        self.vector_size = vector_size
+        self.vectors_fingerprint = vectors_fingerprint
+        self.table_signature = table_signature
+
+    def save(self, path: str) -> None:
+        """
+        Save the bundle to disk.
+
+        Args:
+            path (str): The file to write the bundle to.
+        """
+        joblib.dump(self, path)
+
+    @classmethod
+    def load(cls, path: str, n_jobs: int = 1) -> 'ClassifierBundle':
+        """
+        Load a bundle, memory-mapping its arrays.
+
+        Args:
+            path (str): The file to read the bundle from.
+            n_jobs (int): Number of cores the classifier evaluates its trees on; -1 uses all of them.
+
+        Returns:
+            ClassifierBundle: The loaded bundle.
+
+        Raises:
+            ValueError: If the file does not hold a bundle of the current format version.
+        """
+        bundle = joblib.load(path, mmap_mode='r')
+        if not isinstance(bundle, cls) or bundle.version != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported classifier bundle in {path}")
+        bundle.classifier.n_jobs = n_jobs
+        return bundle
+
+
+def dataframe_hash(df: pd.DataFrame) -> str:
+    """
+    Compute the lexicon hash of a DataFrame loaded with load_and_prepare_data.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing the words, their origin languages and meanings.
+
+    Returns:
+        str: Hex digest identifying the lexicon contents.
+    """
+    columns = ['word', 'origin_language', 'noun', 'adj', 'verb']
+    return lexicon_hash(df[columns].itertuples(index=False, name=None))
+
+
+def default_bundle_path() -> str:
+    """
+    Return the default location of the classifier bundle.
+
+    Returns:
+        str: models/origin_classifier.joblib in the project directory.
+    """
+    return os.path.join(os.environ.get("ETYMOAGENT"), 'models', BUNDLE_FILE)
+
+
+def train_or_load_classifier(df: pd.DataFrame, word_vectors: Optional[WordVectors] = None,
+                             bundle_path: Optional[str] = None, force: bool = False,
+                             signature: Optional[Dict[str, Any]] = None) -> ClassifierBundle:
+    """
+    Load the classifier bundle if it is current, otherwise train a new one and save it.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing the words and their origin languages.
+        word_vectors (Optional[WordVectors]): Word vectors for the semantic features; loaded with
+            load_word_vectors if none are given.
+        bundle_path (Optional[str]): Where the bundle is stored; defaults to default_bundle_path().
+        force (bool): Retrain even if the stored bundle is current.
+        signature (Optional[Dict[str, Any]]): The table_signature of the database df was loaded from, read
+            before loading it; recorded in the bundle for load_current_classifier.
+
+    Returns:
+        ClassifierBundle: The current classifier bundle.
+    """
+    bundle_path = bundle_path or default_bundle_path()
+    current_hash = dataframe_hash(df)
+    # The vectors are memory-mapped, so loading them just to check the bundle is cheap
+    if word_vectors is None:
+        word_vectors = load_word_vectors()
+    current_vectors = vectors_fingerprint(word_vectors)
+
+    if not force and os.path.isfile(bundle_path):
+        try:
+            bundle = ClassifierBundle.load(bundle_path)
+            if bundle.lexicon_hash == current_hash and bundle.vectors_fingerprint == current_vectors:
+                if signature is not None and bundle.table_signature != signature:
+                    # Same contents under another generation, for example after a crawl that found nothing new
+                    bundle.table_signature = signature
+                    bundle.save(bundle_path)
+                print(f"Loaded classifier bundle from {bundle_path}")
+                return bundle
+            print("Classifier bundle is out of date, retraining...")
+        except Exception as e:
+            print(f"Error loading classifier bundle from {bundle_path}: {e}")
+
+    X, y, vectorizer = combine_features(df, word_vectors)
+    clf = train_and_evaluate_model(initialize_model(), X, y)
+    bundle = ClassifierBundle(current_hash, vectorizer, clf, word_vectors.vector_size, current_vectors, signature)
+    bundle.save(bundle_path)
+    print(f"Saved classifier bundle to {bundle_path}")
+    return bundle
+
+
+def load_current_classifier(signature: Dict[str, Any], word_vectors: WordVectors,
+                            bundle_path: Optional[str] = None, n_jobs: int = 1) -> ClassifierBundle:
+    """
+    Load the classifier bundle for serving, without reading the lexicon and without ever training.
+
+    Args:
+        signature (Dict[str, Any]): The table_signature of the database being served.
+        word_vectors (WordVectors): The word vectors the engine featurizes queries with.
+        bundle_path (Optional[str]): Where the bundle is stored; defaults to default_bundle_path().
+        n_jobs (int): Number of cores the classifier evaluates its trees on.
+
+    Returns:
+        ClassifierBundle: The bundle.
+
+    Raises:
+        FileNotFoundError: If there is no bundle.
+        ValueError: If the bundle is unreadable, or was trained from another state of the database or with
+            other word vectors; run `python3 models/classifier.py` to retrain it.
+    """
+    bundle_path = bundle_path or default_bundle_path()
+    if not os.path.isfile(bundle_path):
+        raise FileNotFoundError(f"No classifier bundle at {bundle_path}, run `python3 models/classifier.py`")
+    bundle = ClassifierBundle.load(bundle_path, n_jobs=n_jobs)
+    if signature.get('generation') is None or bundle.table_signature != signature:
+        raise ValueError(f"Classifier bundle {bundle_path} was trained on another state of the database, "
+                         f"run `python3 models/classifier.py`")
+    if bundle.vectors_fingerprint != vectors_fingerprint(word_vectors):
+        raise ValueError(f"Classifier bundle {bundle_path} was trained with other word vectors, "
+                         f"run `python3 models/classifier.py`")
+    return bundle
+
+
+def featurize(words: List[str], bundle: ClassifierBundle, word_vectors: WordVectors) -> sparse.csr_matrix:
+    """
+    Build the classifier features of query words, the same way combine_features does for training.
+
+    Args:
+        words (List[str]): The normalized query words.
+        bundle (ClassifierBundle): The bundle holding the fitted vectorizer.
+        word_vectors (WordVectors): Word vectors for the semantic features.
+
+    Returns:
+        sparse.csr_matrix: One feature row per word.
+
+    Raises:
+        ValueError: If the word vectors do not match the ones the classifier was trained with.
+    """
+    if word_vectors.vector_size != bundle.vector_size:
+        raise ValueError(f"Classifier was trained with {bundle.vector_size}-d vectors, got {word_vectors.vector_size}-d")
+    df = pd.DataFrame({'word': words})
+    semantic_features = extract_semantic_features(df, word_vectors)
+    orthographic_features = bundle.vectorizer.transform(df['word'])
+    return sparse.hstack((sparse.csr_matrix(semantic_features), orthographic_features), format='csr', dtype=np.float32)
+
+
+def predict_origin_probabilities(words: List[str], bundle: ClassifierBundle,
+                                 word_vectors: WordVectors) -> List[Dict[str, float]]:
+    """
+    Predict origin language probabilities for a batch of words with the classifier.
+
+    The trees are evaluated on the number of cores the bundle was loaded with; the bundle is not modified, so
+    concurrent requests can share it.
+
+    Args:
+        words (List[str]): The normalized query words.
+        bundle (ClassifierBundle): The classifier bundle.
+        word_vectors (WordVectors): Word vectors for the semantic features.
+
+    Returns:
+        List[Dict[str, float]]: For each word, the probability of every origin language in bundle.labels.
+    """
+    if not words:
+        return []
+    X = featurize(words, bundle, word_vectors)
+    probabilities = bundle.classifier.predict_proba(X)
+    return [dict(zip(bundle.labels, map(float, row))) for row in probabilities]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train or refresh the EtymoAgent origin classifier bundle.")
+    parser.add_argument('--force', action='store_true', help="Retrain even if the bundle is current.")
+    args = parser.parse_args()
+
+    # Use the importable module so the pickled bundle refers to models.classifier rather than __main__
+    from models.classifier import train_or_load_classifier as train_or_load
+
+    start_time = time.time()
+    db_path = os.path.join(os.environ.get("ETYMOAGENT"), 'data', 'etymoagent.db')
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_generation_counter(conn)
+    finally:
+        conn.close()
+    # Read before loading, so a change made in between leaves the bundle out of date rather than unnoticed
+    signature = table_signature(db_path)
+    train_or_load(load_and_prepare_data('etymoagent.db'), force=args.force, signature=signature)
+    print(f"Elapsed time: {time.time() - start_time:.2f} seconds")
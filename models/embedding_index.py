@@ -0,0 +1,316 @@
+"""
+embedding_index.py: Cosine similarity search over a matrix of word embeddings.
+
+The embeddings are stacked once into a float32 matrix whose rows are normalized to unit length, so the
+cosine similarity of a query against every word is a single matrix-vector product, and the top-k
+neighbours are selected with argpartition instead of sorting every score.
+
+Exact search is still linear in the vocabulary, so IVFIndex adds an approximate inverted-file index: a
+spherical k-means coarse quantizer splits the vectors into n_lists clusters, and a query only scores the
+vectors of the nprobe clusters whose centroids are closest to it. nprobe trades recall for latency, and
+recall_report measures that tradeoff against exact search. The index can be built offline and saved.
+
+Usage:
+    python3 models/embedding_index.py [--n-lists N] [--k K]
+
+Modules used:
+- numpy: For the embedding matrix and the similarity search.
+- argparse: For the command line interface.
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Scale every row of a matrix to unit length; all-zero rows stay zero.
+
+    Args:
+        matrix (np.ndarray): The matrix to normalize.
+
+    Returns:
+        np.ndarray: A float32 copy of the matrix with unit-length rows.
+    """
+    matrix = np.array(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    matrix /= norms
+    return matrix
+
+
+class EmbeddingIndex:
+    """
+    Exact cosine similarity index over word embeddings.
+
+    Attributes:
+        words (List[str]): The indexed words, in row order.
+        matrix (np.ndarray): The (len(words), dim) float32 matrix of unit-length embeddings.
+    """
+
+    def __init__(self, words: Sequence[str], vectors: np.ndarray) -> None:
+        """
+        Build the index.
+
+        Args:
+            words (Sequence[str]): The words, in row order.
+            vectors (np.ndarray): One embedding per word.
+        """
+        self.words = list(words)
+        self.matrix = normalize_rows(vectors)
+
+    @classmethod
+    def from_dict(cls, word_vectors: Dict[str, np.ndarray]) -> 'EmbeddingIndex':
+        """
+        Build the index from a word -> vector mapping.
+
+        Args:
+            word_vectors (Dict[str, np.ndarray]): The embeddings of each word.
+
+        Returns:
+            EmbeddingIndex: The index.
+        """
+        words = list(word_vectors)
+        if not words:
+            return cls([], np.zeros((0, 0), dtype=np.float32))
+        return cls(words, np.stack([word_vectors[word] for word in words]))
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def search(self, vector: np.ndarray, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Find the k words most similar to a query embedding.
+
+        Args:
+            vector (np.ndarray): The query embedding.
+            k (int): The number of neighbours to return.
+
+        Returns:
+            List[Tuple[str, float]]: (word, cosine similarity) pairs, most similar first. Empty if the
+            index is empty or the query vector is all zeros.
+        """
+        norm = np.linalg.norm(vector)
+        if not self.words or norm == 0:
+            return []
+        scores = self.matrix @ (np.asarray(vector, dtype=np.float32) / norm)
+        return self._top_k(np.arange(len(scores)), scores, k)
+
+    def _top_k(self, rows: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """
+        Select the k best scoring rows.
+
+        Args:
+            rows (np.ndarray): Row ids of the scored words.
+            scores (np.ndarray): The score of each row, aligned with rows.
+            k (int): The number of neighbours to return.
+
+        Returns:
+            List[Tuple[str, float]]: (word, score) pairs, best first; ties resolve to the lowest row id.
+        """
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.lexsort((rows[top], -scores[top]))]
+        return [(self.words[rows[i]], float(scores[i])) for i in top]
+
+
+class IVFIndex(EmbeddingIndex):
+    """
+    Approximate cosine similarity index with a k-means coarse quantizer and inverted lists.
+
+    Attributes:
+        centroids (np.ndarray): The (n_lists, dim) unit-length cluster centroids.
+        nprobe (int): Default number of clusters scored per query.
+    """
+
+    def __init__(self, words: Sequence[str], vectors: np.ndarray, n_lists: Optional[int] = None,
+                 nprobe: int = 8, n_iter: int = 10, seed: int = 42) -> None:
+        """
+        Build the index by clustering the embeddings.
+
+        Args:
+            words (Sequence[str]): The words, in row order.
+            vectors (np.ndarray): One embedding per word.
+            n_lists (Optional[int]): Number of clusters; defaults to the square root of the vocabulary size.
+            nprobe (int): Default number of clusters scored per query.
+            n_iter (int): Number of k-means iterations.
+            seed (int): Seed for the k-means initialization.
+        """
+        super().__init__(words, vectors)
+        self.nprobe = nprobe
+        if not self.words:
+            self.centroids = np.zeros((0, self.matrix.shape[1]), dtype=np.float32)
+            self._list_rows = np.zeros(0, dtype=np.int64)
+            self._list_offsets = np.zeros(1, dtype=np.int64)
+            return
+        n_lists = min(n_lists or max(1, int(np.sqrt(len(self.words)))), len(self.words))
+        self.centroids = self._train_centroids(n_lists, n_iter, np.random.default_rng(seed))
+        self._build_lists(self._assign(self.matrix))
+
+    def _assign(self, matrix: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """
+        Assign every row of a matrix to its closest centroid.
+
+        Args:
+            matrix (np.ndarray): Unit-length vectors.
+            chunk_size (int): Rows scored per matrix product, to bound memory.
+
+        Returns:
+            np.ndarray: The cluster of every row.
+        """
+        assignments = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), chunk_size):
+            chunk = matrix[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return assignments
+
+    def _train_centroids(self, n_lists: int, n_iter: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        Run spherical k-means on a sample of the embeddings.
+
+        Args:
+            n_lists (int): Number of clusters.
+            n_iter (int): Number of iterations.
+            rng (np.random.Generator): Random generator for the initialization.
+
+        Returns:
+            np.ndarray: The unit-length centroids.
+        """
+        sample_size = min(len(self.matrix), 256 * n_lists)
+        sample = self.matrix[rng.choice(len(self.matrix), sample_size, replace=False)]
+        self.centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assignments = self._assign(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignments, sample)
+            empty = ~sums.any(axis=1)
+            # Reseed empty clusters with random sample points
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            self.centroids = normalize_rows(sums)
+        return self.centroids
+
+    def _build_lists(self, assignments: np.ndarray) -> None:
+        """
+        Group the row ids by cluster into a CSR-style inverted list layout.
+
+        Args:
+            assignments (np.ndarray): The cluster of every row.
+        """
+        self._list_rows = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+        self._list_offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def search(self, vector: np.ndarray, k: int = 5, nprobe: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Find approximately the k words most similar to a query embedding.
+
+        Args:
+            vector (np.ndarray): The query embedding.
+            k (int): The number of neighbours to return.
+            nprobe (Optional[int]): Number of clusters to score; defaults to self.nprobe. Higher values
+                raise recall and latency, and nprobe equal to the number of clusters is exact search.
+
+        Returns:
+            List[Tuple[str, float]]: (word, cosine similarity) pairs, most similar first.
+        """
+        norm = np.linalg.norm(vector)
+        if not self.words or norm == 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32) / norm
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        rows = np.concatenate([self._list_rows[self._list_offsets[c]:self._list_offsets[c + 1]] for c in probes])
+        scores = self.matrix[rows] @ query
+        return self._top_k(rows, scores, k)
+
+    def save(self, path: str) -> None:
+        """
+        Save the index to a .npz file.
+
+        Args:
+            path (str): The file to write the index to.
+        """
+        np.savez(path, words=np.array(self.words, dtype=str), matrix=self.matrix, centroids=self.centroids,
+                 list_rows=self._list_rows, list_offsets=self._list_offsets, nprobe=self.nprobe)
+
+    @classmethod
+    def load(cls, path: str) -> 'IVFIndex':
+        """
+        Load an index written with save().
+
+        Args:
+            path (str): The file to read the index from.
+
+        Returns:
+            IVFIndex: The loaded index.
+        """
+        index = cls.__new__(cls)
+        with np.load(path) as data:
+            index.words = data['words'].tolist()
+            index.matrix = data['matrix']
+            index.centroids = data['centroids']
+            index._list_rows = data['list_rows']
+            index._list_offsets = data['list_offsets']
+            index.nprobe = int(data['nprobe'])
+        return index
+
+
+def recall_report(ann_index: IVFIndex, exact_index: EmbeddingIndex, queries: np.ndarray, k: int = 10,
+                  nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32)) -> List[Dict[str, Any]]:
+    """
+    Measure recall and latency of the approximate index against exact search.
+
+    Args:
+        ann_index (IVFIndex): The approximate index.
+        exact_index (EmbeddingIndex): The exact index over the same vectors.
+        queries (np.ndarray): Query embeddings, one per row.
+        k (int): The number of neighbours compared.
+        nprobes (Sequence[int]): The nprobe values to measure.
+
+    Returns:
+        List[Dict[str, Any]]: For each nprobe, the mean recall@k and the mean query latency in milliseconds,
+        followed by the latency of exact search.
+    """
+    start = time.perf_counter()
+    exact = [{word for word, _ in exact_index.search(query, k)} for query in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+
+    report = []
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        found = [{word for word, _ in ann_index.search(query, k, nprobe)} for query in queries]
+        latency_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+        recall = np.mean([len(f & e) / len(e) for f, e in zip(found, exact) if e]) if queries.size else 0.0
+        report.append({'nprobe': nprobe, f'recall@{k}': float(recall), 'latency_ms': latency_ms})
+    report.append({'nprobe': 'exact', f'recall@{k}': 1.0, 'latency_ms': exact_ms})
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the IVF index over the lexicon vectors and report recall.")
+    parser.add_argument('--n-lists', type=int, default=None, help="Number of k-means clusters.")
+    parser.add_argument('--k', type=int, default=10, help="Number of neighbours for the recall report.")
+    parser.add_argument('--queries', type=int, default=200, help="Number of sampled query words.")
+    args = parser.parse_args()
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from models.vectors import LEXICON_VECTORS_DIR, VectorTable, models_dir
+
+    table_dir = os.path.join(models_dir(), LEXICON_VECTORS_DIR)
+    table = VectorTable.load(table_dir)
+    start_time = time.time()
+    ivf = IVFIndex(table.words, table.vectors, n_lists=args.n_lists)
+    print(f"Built IVF index with {len(ivf.centroids)} lists in {time.time() - start_time:.2f} seconds")
+    ivf.save(os.path.join(table_dir, 'ivf.npz'))
+
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(table), min(args.queries, len(table)), replace=False)
+    for row in recall_report(ivf, EmbeddingIndex(table.words, table.vectors), ivf.matrix[sample], args.k):
+        print(row)
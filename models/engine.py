@@ -0,0 +1,198 @@
+"""
+engine.py: A long-lived etymology inference engine for the EtymoAgent web application.
+
+The engine loads the lexicon from the SQLite database once and keeps it in memory as a compact Lexicon, so
+that the Flask application can answer etymology queries in-process instead of starting a new Python
+interpreter running models/agent.py for every request. Only the meanings of the closest word are read from
+the database per lookup. Lookups return the same dictionary that agent.main serializes to JSON.
+
+Nearest-word search goes through an index built once over the lexicon (see agent.MATCHERS). For the
+BK-tree, when an index path is given, the tree is loaded from disk if it matches the current lexicon and
+written there otherwise.
+
+When a snapshot path is given and the snapshot built by `models/snapshot.py build-snapshot` matches the
+database, the engine maps the lexicon and, for the 'qgram' matcher, its index from the snapshot instead of
+reading the table and building them, so startup does not depend on the size of the lexicon.
+
+In 'classifier' mode the engine also loads the persisted origin classifier bundle and the word vector table.
+The origin language then comes from the classifier, and the response adds the probability of every origin
+language under 'origin_probabilities'. The closest word and its meanings still come from the index. The
+bundle is trained offline by `models/classifier.py`; if there is no bundle current with the database, the
+engine answers in 'nearest' mode instead.
+
+Modules used:
+- models.lexicon: For holding the lexicon loaded from the database.
+- models.snapshot: For opening the prebuilt lexicon snapshot.
+- models.bktree, models.ngram_index: For the nearest-word indexes.
+- models.classifier: For the origin classifier used in 'classifier' mode.
+"""
+
+import os
+from typing import Dict, Any, List, Optional
+from models.agent import (load_lexicon, load_word_vectors, predict_origin, build_result,
+                          build_word_index)
+from models.lexicon import Lexicon
+from models.snapshot import Snapshot, SnapshotError, is_current, lexicon_version, open_snapshot, table_signature
+from models.bktree import BKTree, words_fingerprint
+from models.classifier import load_current_classifier, predict_origin_probabilities
+
+MODES = ['nearest', 'classifier']
+
+
+class EtymologyEngine:
+    """
+    In-process etymology engine that keeps the lexicon warm between requests.
+
+    Attributes:
+        db_name (str): The name of the database file the lexicon was loaded from.
+        db_path (str): Path of that database.
+        lexicon (Lexicon): The lexicon words and their origin languages.
+        matcher (str): The kind of nearest-word index in use, one of agent.MATCHERS.
+        word_index (Optional[WordIndex]): Nearest-word index over the lexicon, None for a plain scan.
+        snapshot_version (Optional[str]): The lexicon_version of the snapshot in use, None if the lexicon was
+            loaded from the database.
+        version (str): Identifies the answers of the engine: the lexicon hash, the id and generation of the
+            table the meanings are read from, the matcher and the mode.
+        mode (str): How the origin language is predicted, one of MODES; 'nearest' if 'classifier' was asked
+            for without a current classifier bundle.
+    """
+
+    def __init__(self, db_name: str = 'etymoagent.db', matcher: str = 'qgram',
+                 index_path: Optional[str] = None, max_distance: int = 2, mode: str = 'nearest',
+                 snapshot_path: Optional[str] = None) -> None:
+        """
+        Load the lexicon from the snapshot or the database and build or load its nearest-word index.
+
+        Args:
+            db_name (str): The name of the database file.
+            matcher (str): The kind of nearest-word index to build, one of agent.MATCHERS.
+            index_path (Optional[str]): File the BK-tree is cached in when matcher is 'bktree'.
+            max_distance (int): The largest edit distance the 'symspell' matcher resolves.
+            mode (str): 'nearest' takes the origin of the closest word, 'classifier' predicts it with the
+                origin classifier.
+            snapshot_path (Optional[str]): The lexicon snapshot, used if it matches the database.
+
+        Raises:
+            ValueError: If the words table is empty or the mode is unknown.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {MODES}")
+        self.db_name = db_name
+        self.db_path = os.path.join(os.environ.get("ETYMOAGENT"), 'data', db_name)
+        self.matcher = matcher
+        self.snapshot_version: Optional[str] = None
+        snapshot = self._open_snapshot(snapshot_path) if snapshot_path else None
+        if snapshot is not None:
+            self.lexicon: Lexicon = snapshot.lexicon
+            self.snapshot_version = snapshot.version
+            contents_version = snapshot.version
+            # The snapshot is current, so its signature is the table's
+            signature = snapshot.header['signature']
+        else:
+            # Read before loading, so a change made in between gives the next engine another version
+            signature = table_signature(self.db_path)
+            self.lexicon = load_lexicon(db_name)
+            contents_version = lexicon_version(self.lexicon.contents_hash(), signature)
+        if not len(self.lexicon):
+            raise ValueError(f"No words found in database '{db_name}'.")
+        if snapshot is not None and matcher == 'qgram':
+            self.word_index = snapshot.qgram_index
+        elif matcher == 'bktree':
+            self.word_index = self._load_bktree(index_path)
+        else:
+            self.word_index = build_word_index(self.lexicon, matcher, max_distance)
+
+        self.classifier_bundle = None
+        self.word_vectors = None
+        if mode == 'classifier':
+            self.word_vectors = load_word_vectors()
+            try:
+                self.classifier_bundle = load_current_classifier(signature, self.word_vectors)
+            except (OSError, ValueError) as e:
+                print(f"Error loading the origin classifier: {e}. Answering in 'nearest' mode.")
+                self.word_vectors = None
+                mode = 'nearest'
+        self.mode = mode
+        self.version = f"{contents_version}:{matcher}:{mode}"
+
+    def _open_snapshot(self, snapshot_path: str) -> Optional[Snapshot]:
+        """
+        Open the lexicon snapshot if it exists and matches the database.
+
+        Args:
+            snapshot_path (str): The snapshot file.
+
+        Returns:
+            Optional[Snapshot]: The snapshot, or None if the lexicon has to be loaded from the database.
+        """
+        if not os.path.isfile(snapshot_path):
+            return None
+        try:
+            snapshot = open_snapshot(snapshot_path, self.db_path)
+        except SnapshotError as e:
+            print(f"Error opening snapshot: {e}")
+            return None
+        if not is_current(snapshot.header, self.db_path):
+            print(f"Snapshot at {snapshot_path} is out of date, loading the lexicon from the database...")
+            return None
+        return snapshot
+
+    def _load_bktree(self, index_path: Optional[str]) -> BKTree:
+        """
+        Load the BK-tree from disk if it is current, otherwise build it (and save it if a path is given).
+
+        Args:
+            index_path (Optional[str]): File the BK-tree is cached in.
+
+        Returns:
+            BKTree: Nearest-word index over the lexicon.
+        """
+        words = self.lexicon
+        if index_path and os.path.isfile(index_path):
+            try:
+                tree = BKTree.load(index_path)
+                if tree.fingerprint == words_fingerprint(words):
+                    return tree
+                print(f"BK-tree at {index_path} is out of date, rebuilding...")
+            except Exception as e:
+                print(f"Error loading BK-tree from {index_path}: {e}")
+
+        tree = BKTree(words)
+        if index_path:
+            tree.save(index_path)
+        return tree
+
+    def lookup(self, word: str) -> Optional[Dict[str, Any]]:
+        """
+        Predict the origin of a word and return the closest lexicon entry.
+
+        Args:
+            word (str): The normalized (stripped, lower-cased) word to look up.
+
+        Returns:
+            Optional[Dict[str, Any]]: The same dictionary agent.main returns as JSON,
+            or None if no match was found.
+        """
+        result = build_result(*predict_origin(word, self.lexicon, self.word_index))
+        if result is not None and self.mode == 'classifier':
+            probabilities = self.predict_origin_probabilities([word])[0]
+            result['origin_language'] = max(probabilities, key=probabilities.get)
+            result['origin_probabilities'] = probabilities
+        return result
+
+    def predict_origin_probabilities(self, words: List[str]) -> List[Dict[str, float]]:
+        """
+        Predict origin language probabilities for a batch of words in one classifier call.
+
+        Args:
+            words (List[str]): The normalized words.
+
+        Returns:
+            List[Dict[str, float]]: For each word, the probability of every origin language.
+
+        Raises:
+            RuntimeError: If the engine is not in 'classifier' mode.
+        """
+        if self.classifier_bundle is None:
+            raise RuntimeError("The origin classifier is only loaded in 'classifier' mode.")
+        return predict_origin_probabilities(words, self.classifier_bundle, self.word_vectors)
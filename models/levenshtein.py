@@ -4,6 +4,12 @@ import numpy as np
 import os, sys
 import editdistance
 
+# Make the project packages importable when this file is run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.ngram_index import QGramIndex
+from models.spacy_vectors import CACHE_DIR, load_or_vectorize
+
 # Load spaCy model
 nlp = spacy.load('en_core_web_md')
 
@@ -22,9 +28,22 @@ def fetch_words_from_db():
     return rows
 
 def vectorize_words(words):
-    return {word: nlp(word).vector for word in words if nlp(word).has_vector}
+    # Batched tokenizer-only vectorization, cached on disk per lexicon version
+    cache_dir = os.path.join(os.environ.get("ETYMOAGENT"), 'models', CACHE_DIR)
+    return load_or_vectorize(nlp, words, cache_dir)
+
+def build_word_index(words):
+    return QGramIndex(list(words), distance=editdistance.eval)
+
+def find_most_similar(input_word, words, word_index=None):
+    # Only the short candidate list from the q-gram index reaches the exact scorer
+    if word_index is not None:
+        match = word_index.nearest(input_word)
+        if match is None:
+            return None, float('inf')
+        row_id, distance = match
+        return word_index.word(row_id), distance
 
-def find_most_similar(input_word, words):
     min_distance = float('inf')
     most_similar_word = None
 
@@ -54,7 +73,8 @@ if __name__ == '__main__':
     rows = fetch_words_from_db()
     words = [row[1] for row in rows]
     word_vectors = vectorize_words(words)
-    similar_word, similarity_score = find_most_similar(user_word, word_vectors)
+    word_index = build_word_index(word_vectors)
+    similar_word, similarity_score = find_most_similar(user_word, word_vectors, word_index)
     
     if similar_word:
         word_info = get_word_info(similar_word)
@@ -0,0 +1,236 @@
+"""
+lexicon.py: The in-memory EtymoAgent lexicon (the `words` table) and helpers describing its contents.
+
+Artifacts derived from the lexicon (trained classifiers, vector caches, indexes) are keyed by a hash of the
+table contents, so they can be reused while the lexicon is unchanged and rebuilt as soon as it changes.
+
+Lexicon is the compact, columnar copy of the table used for lookups. Holding the table as a pandas DataFrame
+costs a Python string object for every word, origin and meaning; the Lexicon instead keeps the words in one
+UTF-8 buffer with an offsets array, the origin languages as small integer codes into a list of distinct
+names, and the database row ids. Meanings are only read from SQLite for the row a lookup returns. A Lexicon
+is a sequence of its words, so the nearest-word indexes can be built over it and share it with
+predict_origin.
+
+Modules used:
+- hashlib: For hashing the table contents.
+- numpy: For the offsets, origin code and row id arrays.
+- sqlite3: For loading the lexicon and its meanings.
+"""
+
+import hashlib
+import sqlite3
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+
+
+def lexicon_hash(rows: Iterable[Sequence[Any]]) -> str:
+    """
+    Compute a hash of the lexicon contents.
+
+    Args:
+        rows (Iterable[Sequence[Any]]): The rows of the words table, in order. Each row is a sequence of
+            column values such as (word, origin_language, noun, adj, verb).
+
+    Returns:
+        str: Hex digest identifying the lexicon contents.
+    """
+    digest = hashlib.sha256()
+    for row in rows:
+        for value in row:
+            digest.update(b'\x00' if value is None else str(value).encode('utf-8'))
+            digest.update(b'\x1f')
+        digest.update(b'\x1e')
+    return digest.hexdigest()
+
+
+def _smallest_dtype(largest: int, smallest: type = np.uint8) -> type:
+    """
+    Pick the smallest integer dtype holding values up to largest.
+
+    Args:
+        largest (int): The largest value to store.
+        smallest (type): The smallest dtype to consider.
+
+    Returns:
+        type: The numpy integer dtype.
+    """
+    for dtype in (np.uint8, np.uint16, np.int32, np.int64):
+        if np.dtype(dtype).itemsize >= np.dtype(smallest).itemsize and largest <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+class Lexicon(Sequence[str]):
+    """
+    Compact columnar store of the lexicon words and their origin languages.
+
+    Row i of the lexicon is the i-th word; it is the row id the nearest-word indexes return.
+
+    Attributes:
+        buffer (Union[bytes, memoryview]): The UTF-8 encoded words, concatenated; a memoryview when the
+            lexicon is opened from a snapshot.
+        offsets (np.ndarray): len(lexicon) + 1 byte offsets; word i is buffer[offsets[i]:offsets[i + 1]].
+        origin_codes (np.ndarray): Origin language code of every word, an index into origin_names.
+        origin_names (List[str]): The distinct origin languages.
+        row_ids (np.ndarray): The `words` table id of every word.
+        db_path (Optional[str]): The database meanings are read from; None if meanings are unavailable.
+    """
+
+    def __init__(self, buffer: Union[bytes, memoryview], offsets: np.ndarray, origin_codes: np.ndarray, origin_names: List[str],
+                 row_ids: np.ndarray, db_path: Optional[str] = None) -> None:
+        self.buffer = buffer
+        self.offsets = offsets
+        self.origin_codes = origin_codes
+        self.origin_names = origin_names
+        self.row_ids = row_ids
+        self.db_path = db_path
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, str, str]], db_path: Optional[str] = None) -> 'Lexicon':
+        """
+        Build a lexicon from (id, word, origin_language) rows.
+
+        Args:
+            rows (Iterable[Tuple[int, str, str]]): The rows, in lexicon order.
+            db_path (Optional[str]): The database meanings are read from.
+
+        Returns:
+            Lexicon: The lexicon.
+        """
+        buffer = bytearray()
+        offsets = [0]
+        codes: Dict[str, int] = {}
+        origin_codes: List[int] = []
+        row_ids: List[int] = []
+        for row_id, word, origin in rows:
+            buffer += word.encode('utf-8')
+            offsets.append(len(buffer))
+            origin_codes.append(codes.setdefault(origin, len(codes)))
+            row_ids.append(row_id)
+        return cls(bytes(buffer), np.array(offsets, dtype=_smallest_dtype(len(buffer))),
+                   np.array(origin_codes, dtype=_smallest_dtype(len(codes))), list(codes),
+                   np.array(row_ids, dtype=_smallest_dtype(max(row_ids, default=0), np.int32)), db_path)
+
+    @classmethod
+    def from_database(cls, db_path: str) -> 'Lexicon':
+        """
+        Load the lexicon from the `words` table, lower-casing the words as load_and_prepare_data does.
+
+        Args:
+            db_path (str): Path of the SQLite database.
+
+        Returns:
+            Lexicon: The lexicon, in row id order.
+        """
+        conn = sqlite3.connect(db_path)
+        try:
+            cursor = conn.execute("SELECT id, word, origin_language FROM words ORDER BY id")
+            return cls.from_rows(((row_id, word.lower(), origin) for row_id, word, origin in cursor), db_path)
+        finally:
+            conn.close()
+
+    @classmethod
+    def from_dataframe(cls, df: Any) -> 'Lexicon':
+        """
+        Build a lexicon without meanings from a DataFrame with 'word' and 'origin_language' columns.
+
+        Args:
+            df (pd.DataFrame): The DataFrame, for example a training split of load_and_prepare_data.
+
+        Returns:
+            Lexicon: The lexicon, in DataFrame order; row ids are the DataFrame index.
+        """
+        return cls.from_rows(zip(df.index, df['word'], df['origin_language']))
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # A memory-mapped buffer cannot be pickled, so worker processes receive a copy
+        state = self.__dict__.copy()
+        state['buffer'] = bytes(self.buffer)
+        return state
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("lexicon row out of range")
+        return str(self.buffer[self.offsets[row]:self.offsets[row + 1]], 'utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        buffer = self.buffer
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield str(buffer[start:end], 'utf-8')
+
+    def origin(self, row: int) -> str:
+        """
+        Return the origin language of a row.
+
+        Args:
+            row (int): The lexicon row.
+
+        Returns:
+            str: The origin language.
+        """
+        return self.origin_names[self.origin_codes[row]]
+
+    def origins(self) -> List[str]:
+        """
+        Return the origin language of every row.
+
+        Returns:
+            List[str]: The origin languages, in row order.
+        """
+        return [self.origin_names[code] for code in self.origin_codes.tolist()]
+
+    def meanings(self, row: int) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """
+        Read the meanings of a row from the database.
+
+        Args:
+            row (int): The lexicon row.
+
+        Returns:
+            Tuple[Optional[str], Optional[str], Optional[str]]: The noun, adjective and verb meanings; all None
+            if the lexicon has no database or its row id no longer holds the word.
+        """
+        if self.db_path is None:
+            return None, None, None
+        conn = sqlite3.connect(self.db_path)
+        try:
+            found = conn.execute("SELECT word, noun, adj, verb FROM words WHERE id = ?",
+                                 (int(self.row_ids[row]),)).fetchone()
+        finally:
+            conn.close()
+        # A row id freed and reused since the lexicon was loaded must not lend its meanings to another word
+        if found is None or found[0].lower() != self[row]:
+            return None, None, None
+        return found[1:]
+
+    def contents_hash(self) -> str:
+        """
+        Hash the row ids, words and origin languages of the lexicon.
+
+        Returns:
+            str: Hex digest identifying the lexicon version.
+        """
+        return lexicon_hash(zip(self.row_ids.tolist(), self, self.origins()))
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Report the memory held by the lexicon columns.
+
+        Returns:
+            Dict[str, int]: Number of words and the bytes used by each column.
+        """
+        return {
+            'words': len(self),
+            'buffer_bytes': len(self.buffer),
+            'offsets_bytes': self.offsets.nbytes,
+            'origin_codes_bytes': self.origin_codes.nbytes,
+            'row_ids_bytes': self.row_ids.nbytes,
+        }
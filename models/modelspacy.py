@@ -3,6 +3,12 @@ import spacy
 import numpy as np
 import os, sys
 
+# Make the project packages importable when this file is run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.embedding_index import EmbeddingIndex, IVFIndex
+from models.spacy_vectors import CACHE_DIR, load_or_vectorize
+
 # Load spaCy model
 nlp = spacy.load('en_core_web_md')
 
@@ -21,19 +27,25 @@ def fetch_words_from_db():
     return rows
 
 def vectorize_words(words):
-    return {word: nlp(word).vector for word in words if nlp(word).has_vector}
+    # Batched tokenizer-only vectorization, cached on disk per lexicon version
+    cache_dir = os.path.join(os.environ.get("ETYMOAGENT"), 'models', CACHE_DIR)
+    return load_or_vectorize(nlp, words, cache_dir)
 
-def find_most_similar(word, word_vectors):
-    if not nlp(word).has_vector:
-        return None, 0
+def build_embedding_index(word_vectors, nprobe=None):
+    # Pre-normalized float32 matrix built once, so each query is a single matrix-vector product.
+    # With nprobe, an approximate IVF index only scores the nprobe closest clusters.
+    exact_index = EmbeddingIndex.from_dict(word_vectors)
+    if nprobe is None or not len(exact_index):
+        return exact_index
+    return IVFIndex(exact_index.words, exact_index.matrix, nprobe=nprobe)
 
-    word_vector = nlp(word).vector
-    similarities = {w: np.dot(word_vector, vec) / (np.linalg.norm(word_vector) * np.linalg.norm(vec)) for w, vec in word_vectors.items()}
-    print(similarities)
-    most_similar_word = max(similarities, key=similarities.get)
-    similarity_score = similarities[most_similar_word]
+def find_most_similar(word, embedding_index, k=5):
+    doc = nlp(word)
+    if not doc.has_vector:
+        return []
 
-    return most_similar_word, similarity_score
+    # Top-k (word, cosine similarity) pairs, most similar first
+    return embedding_index.search(doc.vector, k)
 
 def get_word_info(word):
     conn = connect_db()
@@ -52,9 +64,12 @@ if __name__ == '__main__':
     rows = fetch_words_from_db()
     words = [row[1] for row in rows]
     word_vectors = vectorize_words(words)
-    similar_word, similarity_score = find_most_similar(user_word, word_vectors)
+    nprobe = os.environ.get("ETYMOAGENT_ANN_NPROBE")
+    embedding_index = build_embedding_index(word_vectors, int(nprobe) if nprobe else None)
+    neighbours = find_most_similar(user_word, embedding_index)
     
-    if similar_word:
+    if neighbours:
+        similar_word, similarity_score = neighbours[0]
         word_info = get_word_info(similar_word)
         if word_info:
             result = {
@@ -63,7 +78,8 @@ if __name__ == '__main__':
                 'origin_language': word_info[2],
                 'noun_meaning': word_info[3],
                 'adj_meaning': word_info[4],
-                'verb_meaning': word_info[5]
+                'verb_meaning': word_info[5],
+                'related_words': neighbours
             }
             print(result)
         else:
@@ -0,0 +1,248 @@
+"""
+ngram_index.py: A character q-gram inverted index for pruning candidates before exact edit distance.
+
+Each word is split into padded character q-grams and every q-gram maps to the ids of the words that
+contain it. A query collects the words sharing q-grams with it and bounds their edit distance from
+below using two filters:
+
+- length filtering: ed(a, b) >= |len(a) - len(b)|
+- count filtering: two strings within edit distance k share at least max(len(a), len(b)) + q - 1 - k * q
+  padded q-grams, so a word sharing c q-grams is at least ceil((max(len(a), len(b)) + q - 1 - c) / q) away.
+
+Candidates are scored in order of their lower bound and the scan stops as soon as the bound exceeds the
+best distance found, so only a short candidate list reaches the exact scorer. Words sharing no q-gram with
+the query are still covered through their length bucket, which keeps the result identical to a brute-force
+scan (ties resolve to the lowest row id). brute_force_nearest is provided as the reference to check this.
+
+The posting lists and length buckets are stored as flat arrays in CSR layout (an offsets array into one
+array of row ids), so a built index can be written to a lexicon snapshot and opened again without copying.
+
+Modules used:
+- Levenshtein: For computing exact edit distances between candidates and the query.
+- collections.defaultdict: For building the posting lists.
+- numpy: For the posting list arrays.
+"""
+
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import Levenshtein
+import numpy as np
+
+PAD_START = '\x02'
+PAD_END = '\x03'
+
+
+def qgrams(word: str, q: int) -> List[str]:
+    """
+    Split a word into padded character q-grams.
+
+    Args:
+        word (str): The word to split.
+        q (int): The q-gram length.
+
+    Returns:
+        List[str]: The len(word) + q - 1 padded q-grams of the word, in order.
+    """
+    padded = PAD_START * (q - 1) + word + PAD_END * (q - 1)
+    return [padded[i:i + q] for i in range(len(padded) - q + 1)]
+
+
+def brute_force_nearest(query: str, words: Iterable[str],
+                        distance: Callable[[str, str], int] = Levenshtein.distance) -> Optional[Tuple[int, int]]:
+    """
+    Find the closest word by comparing the query against every word.
+
+    Args:
+        query (str): The word to look up.
+        words (Iterable[str]): The words to search, in row order.
+        distance (Callable[[str, str], int]): The edit distance function.
+
+    Returns:
+        Optional[Tuple[int, int]]: The row id of the first word with the smallest distance and that
+        distance, or None if there are no words.
+    """
+    best = None
+    for row_id, word in enumerate(words):
+        d = distance(query, word)
+        if best is None or d < best[1]:
+            best = (row_id, d)
+    return best
+
+
+class QGramIndex:
+    """
+    Inverted index from padded character q-grams to word ids.
+
+    Attributes:
+        q (int): The q-gram length.
+        grams (List[str]): The distinct q-grams, in posting list order.
+    """
+
+    def __init__(self, words: Sequence[str], q: int = 2,
+                 distance: Callable[[str, str], int] = Levenshtein.distance) -> None:
+        """
+        Build the index.
+
+        Args:
+            words (Sequence[str]): The words to index; a word's position is its row id.
+            q (int): The q-gram length.
+            distance (Callable[[str, str], int]): The exact edit distance function.
+        """
+        # A word containing a q-gram n times is listed n times in a row in its posting list
+        postings: Dict[str, List[int]] = defaultdict(list)
+        lengths: List[int] = []
+        for row_id, word in enumerate(words):
+            lengths.append(len(word))
+            for gram in qgrams(word, q):
+                postings[gram].append(row_id)
+
+        grams = list(postings)
+        counts = [len(postings[gram]) for gram in grams]
+        posting_rows = np.fromiter((row_id for gram in grams for row_id in postings[gram]), dtype=np.int32,
+                                   count=sum(counts))
+        lengths_array = np.array(lengths, dtype=np.int32)
+        bucket_lengths, bucket_counts = np.unique(lengths_array, return_counts=True)
+        arrays = {
+            'posting_offsets': np.concatenate(([0], np.cumsum(counts, dtype=np.int64))),
+            'posting_rows': posting_rows,
+            'lengths': lengths_array,
+            'bucket_lengths': bucket_lengths.astype(np.int32),
+            'bucket_offsets': np.concatenate(([0], np.cumsum(bucket_counts, dtype=np.int64))),
+            'bucket_rows': np.argsort(lengths_array, kind='stable').astype(np.int32),
+        }
+        self._set_arrays(words, q, grams, arrays, distance)
+
+    @classmethod
+    def from_arrays(cls, words: Sequence[str], q: int, grams: List[str], arrays: Dict[str, np.ndarray],
+                    distance: Callable[[str, str], int] = Levenshtein.distance) -> 'QGramIndex':
+        """
+        Rebuild an index from the arrays returned by arrays(), for example memory-mapped from a snapshot.
+
+        Args:
+            words (Sequence[str]): The indexed words, in row order.
+            q (int): The q-gram length.
+            grams (List[str]): The distinct q-grams, in posting list order.
+            arrays (Dict[str, np.ndarray]): The index arrays.
+            distance (Callable[[str, str], int]): The exact edit distance function.
+
+        Returns:
+            QGramIndex: The index, sharing the given arrays.
+        """
+        index = cls.__new__(cls)
+        index._set_arrays(words, q, grams, arrays, distance)
+        return index
+
+    def _set_arrays(self, words: Sequence[str], q: int, grams: List[str], arrays: Dict[str, np.ndarray],
+                    distance: Callable[[str, str], int]) -> None:
+        self.q = q
+        self.grams = grams
+        self._distance = distance
+        self._words = words
+        self._gram_ids = {gram: gram_id for gram_id, gram in enumerate(grams)}
+        self._arrays = arrays
+        self._posting_offsets = arrays['posting_offsets']
+        self._posting_rows = arrays['posting_rows']
+        self._lengths = arrays['lengths']
+        self._bucket_lengths = arrays['bucket_lengths'].tolist()
+        self._bucket_offsets = arrays['bucket_offsets']
+        self._bucket_rows = arrays['bucket_rows']
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Return the arrays holding the index.
+
+        Returns:
+            Dict[str, np.ndarray]: The posting lists and length buckets in CSR layout, and the word lengths.
+        """
+        return self._arrays
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def word(self, row_id: int) -> str:
+        """
+        Return the word stored at a row id.
+
+        Args:
+            row_id (int): The row id.
+
+        Returns:
+            str: The word.
+        """
+        return self._words[row_id]
+
+    def _lower_bound(self, query_length: int, length: int, common: int) -> int:
+        longest = max(query_length, length)
+        count_bound = -(-(longest + self.q - 1 - common) // self.q)
+        return max(abs(query_length - length), count_bound, 0)
+
+    def candidates(self, query: str) -> List[Tuple[int, int]]:
+        """
+        Generate the words sharing at least one q-gram with the query.
+
+        Args:
+            query (str): The word to look up.
+
+        Returns:
+            List[Tuple[int, int]]: (lower bound on edit distance, row id) pairs sorted in ascending order.
+        """
+        common: Dict[int, int] = defaultdict(int)
+        for gram, query_count in Counter(qgrams(query, self.q)).items():
+            gram_id = self._gram_ids.get(gram)
+            if gram_id is None:
+                continue
+            start, end = self._posting_offsets[gram_id], self._posting_offsets[gram_id + 1]
+            previous, run = -1, 0
+            for row_id in self._posting_rows[start:end].tolist():
+                run = run + 1 if row_id == previous else 1
+                previous = row_id
+                if run <= query_count:
+                    common[row_id] += 1
+
+        query_length = len(query)
+        row_ids = list(common)
+        lengths = self._lengths[row_ids].tolist() if row_ids else []
+        bounds = [(self._lower_bound(query_length, length, common[row_id]), row_id)
+                  for row_id, length in zip(row_ids, lengths)]
+        bounds.sort()
+        return bounds
+
+    def nearest(self, query: str) -> Optional[Tuple[int, int]]:
+        """
+        Find the word closest to the query.
+
+        Args:
+            query (str): The word to look up.
+
+        Returns:
+            Optional[Tuple[int, int]]: The row id of the closest word and its distance,
+            or None if the index is empty.
+        """
+        if not len(self._lengths):
+            return None
+
+        best_id, best_distance = None, float('inf')
+
+        def score(row_id: int) -> None:
+            nonlocal best_id, best_distance
+            d = self._distance(query, self._words[row_id])
+            if d < best_distance or (d == best_distance and row_id < best_id):
+                best_id, best_distance = row_id, d
+
+        candidates = self.candidates(query)
+        for lower_bound, row_id in candidates:
+            if lower_bound > best_distance:
+                break
+            score(row_id)
+
+        # Words sharing no q-gram with the query can only be reached through their length bucket
+        seen = {row_id for _, row_id in candidates}
+        query_length = len(query)
+        for bucket, length in enumerate(self._bucket_lengths):
+            if self._lower_bound(query_length, length, 0) > best_distance:
+                continue
+            start, end = self._bucket_offsets[bucket], self._bucket_offsets[bucket + 1]
+            for row_id in self._bucket_rows[start:end].tolist():
+                if row_id not in seen:
+                    score(row_id)
+        return best_id, best_distance
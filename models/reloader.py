@@ -0,0 +1,220 @@
+"""
+reloader.py: Zero-downtime reloads of the EtymoAgent etymology engine.
+
+The web application used to pick up new words only when it was restarted. EngineReloader holds the active
+EtymologyEngine and replaces it with a new generation in a background thread: the rebuild step (writing a
+new lexicon snapshot) runs first, then the new engine is loaded and its indexes built, and only when it is
+ready to serve is it swapped in with a single reference assignment. A request keeps the engine it started
+with, so in-flight requests finish on the old generation, and no request ever waits for a cold engine.
+Lexicon snapshots are replaced by renaming a new file into place, so the old generation's mapping stays
+valid until its last user drops it.
+
+A reload can be requested directly, for example from an admin endpoint, or by watching files: the watcher
+polls the size and modification time of the database, its write-ahead log and the snapshot, and requests a
+reload once they have changed and then stayed unchanged for a full poll interval, so a crawl that is still
+writing does not trigger a reload per batch.
+
+Modules used:
+- threading: For the rebuild and watcher threads.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from models.engine import EtymologyEngine
+
+FileState = Dict[str, Optional[Tuple[int, int]]]
+
+
+def file_state(paths: List[str]) -> FileState:
+    """
+    Return the size and modification time of files.
+
+    Args:
+        paths (List[str]): The files.
+
+    Returns:
+        FileState: (size, mtime in ns) of every file, None for a missing file.
+    """
+    state: FileState = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            state[path] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            state[path] = None
+    return state
+
+
+class EngineReloader:
+    """
+    Holder of the active etymology engine that rebuilds and swaps it in the background.
+
+    Attributes:
+        generation (int): Number of engines loaded so far; 0 until the first one is ready.
+        last_error (Optional[str]): The error of the last failed reload, None if it succeeded.
+    """
+
+    def __init__(self, load_engine: Callable[[], EtymologyEngine], rebuild: Optional[Callable[[], None]] = None,
+                 watch_paths: Optional[List[str]] = None, poll_interval: float = 5.0) -> None:
+        """
+        Args:
+            load_engine (Callable[[], EtymologyEngine]): Loads a new engine from the current lexicon.
+            rebuild (Optional[Callable[[], None]]): Builds the artifacts of a new generation, such as the
+                lexicon snapshot, before the engine is loaded.
+            watch_paths (Optional[List[str]]): Files whose changes trigger a reload.
+            poll_interval (float): Seconds between two checks of the watched files.
+        """
+        self.load_engine = load_engine
+        self.rebuild = rebuild
+        self.watch_paths = watch_paths or []
+        self.poll_interval = poll_interval
+        self.generation = 0
+        self.last_error: Optional[str] = None
+        self._engine: Optional[EtymologyEngine] = None
+        self._lock = threading.Lock()
+        self._reload_thread: Optional[threading.Thread] = None
+        self._pending = False
+        self._pending_rebuild = False
+        self._baseline = file_state(self.watch_paths)
+        self._stop = threading.Event()
+        self._watch_thread: Optional[threading.Thread] = None
+
+    @property
+    def engine(self) -> Optional[EtymologyEngine]:
+        """
+        Returns:
+            Optional[EtymologyEngine]: The active engine, None until the first generation is loaded.
+        """
+        return self._engine
+
+    @property
+    def reloading(self) -> bool:
+        """
+        Returns:
+            bool: True while a reload is running.
+        """
+        return self._reload_thread is not None
+
+    def load(self) -> EtymologyEngine:
+        """
+        Load the first generation synchronously, without running the rebuild step.
+
+        Returns:
+            EtymologyEngine: The active engine.
+        """
+        with self._lock:
+            if self._engine is None:
+                self._swap(self.load_engine())
+            return self._engine
+
+    def reload(self, rebuild: bool = True) -> bool:
+        """
+        Start building a new generation in the background.
+
+        A reload requested while one is running is started again when it finishes, so the latest changes
+        are always picked up; it runs the rebuild step if any of the requests queued in the meantime asked
+        for it.
+
+        Args:
+            rebuild (bool): Run the rebuild step before loading the new engine.
+
+        Returns:
+            bool: True if the reload started now, False if it was queued behind the running one.
+        """
+        with self._lock:
+            if self._reload_thread is not None:
+                self._pending = True
+                self._pending_rebuild = self._pending_rebuild or rebuild
+                return False
+            self._reload_thread = threading.Thread(target=self._run_reload, args=(rebuild,), daemon=True)
+            self._reload_thread.start()
+            return True
+
+    def _run_reload(self, rebuild: bool) -> None:
+        """
+        Build a new generation and swap it in, repeating while reloads were requested in the meantime.
+
+        Args:
+            rebuild (bool): Run the rebuild step before loading the first new engine; the repeats follow the
+                requests queued in the meantime.
+        """
+        while True:
+            start_time = time.time()
+            # Changes made from here on are picked up by the next reload
+            baseline = file_state(self.watch_paths)
+            try:
+                if rebuild and self.rebuild is not None:
+                    self.rebuild()
+                engine = self.load_engine()
+                with self._lock:
+                    self._swap(engine)
+                    self._baseline = file_state(self.watch_paths) if rebuild else baseline
+                self.last_error = None
+                print(f"Loaded engine generation {self.generation} in {time.time() - start_time:.2f} seconds")
+            except Exception as e:
+                self.last_error = repr(e)
+                print(f"Error reloading the engine: {e!r}")
+            with self._lock:
+                if not self._pending:
+                    self._reload_thread = None
+                    return
+                rebuild = self._pending_rebuild
+                self._pending = False
+                self._pending_rebuild = False
+
+    def _swap(self, engine: EtymologyEngine) -> None:
+        """
+        Make an engine the active one. Must be called with the lock held.
+
+        Args:
+            engine (EtymologyEngine): The new engine.
+        """
+        self._engine = engine
+        self.generation += 1
+
+    def start_watching(self) -> None:
+        """
+        Start the thread polling the watched files.
+        """
+        if self._watch_thread is None and self.watch_paths:
+            self._watch_thread = threading.Thread(target=self._watch, daemon=True)
+            self._watch_thread.start()
+
+    def stop_watching(self) -> None:
+        """
+        Stop the thread polling the watched files.
+        """
+        self._stop.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join()
+            self._watch_thread = None
+
+    def _watch(self) -> None:
+        """
+        Poll the watched files and request a reload once they changed and settled.
+        """
+        previous = file_state(self.watch_paths)
+        while not self._stop.wait(self.poll_interval):
+            current = file_state(self.watch_paths)
+            if current == previous and current != self._baseline and not self.reloading:
+                print("Lexicon files changed, reloading the engine...")
+                self.reload()
+            previous = current
+
+    def status(self) -> Dict[str, object]:
+        """
+        Describe the active generation.
+
+        Returns:
+            Dict[str, object]: The generation, the snapshot version of the active engine, whether a reload
+            is running and the error of the last failed one.
+        """
+        engine = self._engine
+        return {
+            'generation': self.generation,
+            'snapshot_version': engine.snapshot_version if engine is not None else None,
+            'reloading': self.reloading,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,222 @@
+"""
+result_cache.py: A cache of etymology query results in front of the EtymoAgent engine.
+
+Query traffic is heavily skewed towards a few thousand words, yet every request used to validate the word
+against WordNet and search the whole lexicon again. ResultCache keeps the responses of recent queries in a
+bounded in-memory LRU map, with an optional time to live, and optionally in a SQLite table that separate
+worker processes share, so a word answered by one worker is a hit for all of them.
+
+Entries are keyed by the version of the engine that answered them (see EtymologyEngine.version) and the
+normalized word, so a lexicon reload invalidates the cache without any coordination, and workers that are
+still answering with the previous engine keep their own entries. Entries of old versions are never looked up
+again: in memory they fall off the end of the LRU order, and prune deletes a version from the shared tier
+once no worker has stored a result for it for retire_after seconds.
+
+Modules used:
+- collections.OrderedDict: For the LRU order of the in-memory entries.
+- sqlite3: For the shared on-disk tier.
+- json: For serializing the results stored on disk.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class ResultCache:
+    """
+    LRU cache of query results with an optional TTL and an optional shared SQLite tier.
+
+    Attributes:
+        max_entries (int): The largest number of results kept in memory.
+        ttl (Optional[float]): Seconds a result stays valid, None to keep it until it is evicted.
+        db_path (Optional[str]): The SQLite database of the shared tier, None for a memory-only cache.
+        max_disk_entries (int): The largest number of results kept in the shared tier.
+        retire_after (float): Seconds after its last stored result an engine version is deleted from the
+            shared tier.
+        version (Optional[str]): The engine version a result was last looked up or cached for.
+        stats (Dict[str, int]): Counters of memory hits, disk hits, misses, evictions and expired entries.
+    """
+
+    # Number of writes between two prunes of the shared tier
+    PRUNE_EVERY = 1000
+
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = None, db_path: Optional[str] = None,
+                 max_disk_entries: int = 100000, retire_after: float = 3600.0) -> None:
+        """
+        Args:
+            max_entries (int): The largest number of results kept in memory.
+            ttl (Optional[float]): Seconds a result stays valid, None to keep it until it is evicted.
+            db_path (Optional[str]): The SQLite database of the shared tier, None for a memory-only cache.
+            max_disk_entries (int): The largest number of results kept in the shared tier.
+            retire_after (float): Seconds after its last stored result an engine version is deleted from
+                the shared tier.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self.retire_after = retire_after
+        self.version: Optional[str] = None
+        self.stats: Dict[str, int] = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+        self._entries: 'OrderedDict[Tuple[str, str], Tuple[Any, Optional[float]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        if db_path is not None:
+            with self._connection() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS query_results (
+                        version TEXT NOT NULL,
+                        word TEXT NOT NULL,
+                        result TEXT NOT NULL,
+                        expires_at REAL,
+                        stored_at REAL NOT NULL,
+                        PRIMARY KEY (version, word)
+                    )
+                ''')
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Return this thread's connection to the shared tier.
+
+        Returns:
+            sqlite3.Connection: The connection, opened on first use in WAL mode.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, version: str, word: str) -> Optional[Any]:
+        """
+        Look up the cached result of a query.
+
+        Args:
+            version (str): The version of the engine answering queries.
+            word (str): The normalized word.
+
+        Returns:
+            Optional[Any]: The cached result, or None on a miss.
+        """
+        now = time.time()
+        key = (version, word)
+        with self._lock:
+            self.version = version
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return result
+                del self._entries[key]
+                self.stats['expired'] += 1
+
+        if self.db_path is not None:
+            row = self._connection().execute(
+                "SELECT result, expires_at FROM query_results WHERE version = ? AND word = ?",
+                (version, word)).fetchone()
+            if row is not None and (row[1] is None or row[1] > now):
+                result = json.loads(row[0])
+                self._remember(version, word, result, row[1])
+                with self._lock:
+                    self.stats['disk_hits'] += 1
+                return result
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return None
+
+    def put(self, version: str, word: str, result: Any) -> None:
+        """
+        Cache the result of a query.
+
+        Args:
+            version (str): The version of the engine that answered the query.
+            word (str): The normalized word.
+            result (Any): The result; it must be JSON serializable when the shared tier is used.
+        """
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        self._remember(version, word, result, expires_at)
+        if self.db_path is None:
+            return
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO query_results (version, word, result, expires_at, stored_at) "
+                         "VALUES (?, ?, ?, ?, ?)", (version, word, json.dumps(result), expires_at, time.time()))
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def _remember(self, version: str, word: str, result: Any, expires_at: Optional[float]) -> None:
+        """
+        Store a result in memory, evicting the least recently used ones beyond max_entries.
+
+        Args:
+            version (str): The version of the engine that answered the query.
+            word (str): The normalized word.
+            result (Any): The result.
+            expires_at (Optional[float]): When the result expires, None if it does not.
+        """
+        key = (version, word)
+        with self._lock:
+            self.version = version
+            self._entries[key] = (result, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def prune(self) -> None:
+        """
+        Delete from the shared tier the expired results, the results of the engine versions no result was
+        stored for in the last retire_after seconds, and the oldest results beyond max_disk_entries.
+
+        The version this cache last served is kept, however long ago its results were stored.
+        """
+        if self.db_path is None:
+            return
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("DELETE FROM query_results WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            conn.execute('''
+                DELETE FROM query_results WHERE version IS NOT ? AND version IN (
+                    SELECT version FROM query_results GROUP BY version HAVING MAX(stored_at) <= ?
+                )
+            ''', (self.version, now - self.retire_after))
+            conn.execute('''
+                DELETE FROM query_results WHERE rowid IN (
+                    SELECT rowid FROM query_results ORDER BY stored_at DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_disk_entries,))
+
+    def clear(self) -> None:
+        """
+        Drop every cached result, in memory and in the shared tier.
+        """
+        with self._lock:
+            self._entries.clear()
+        if self.db_path is not None:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM query_results")
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Describe the cache contents and counters.
+
+        Returns:
+            Dict[str, Any]: The counters, the number of entries in memory, the hit rate and the version.
+        """
+        with self._lock:
+            stats: Dict[str, Any] = dict(self.stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        stats['version'] = self.version
+        return stats
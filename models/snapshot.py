@@ -0,0 +1,331 @@
+"""
+snapshot.py: A prebuilt, memory-mappable snapshot of the EtymoAgent lexicon and its q-gram index.
+
+Every process serving lookups used to read the `words` table from SQLite and rebuild the Lexicon and its
+nearest-word index on startup. The build-snapshot command does that work once and writes the result to a
+single file. Opening the file maps it read-only and wraps every array as a numpy view of the mapping, so
+nothing is parsed or copied: startup costs a header read, and all the processes serving from the same
+snapshot share its physical pages through the page cache.
+
+File layout, all integers little-endian:
+
+- A fixed preamble: the magic bytes b'ETYSNAP\\0', the format version, the header length, the CRC-32 of the
+  header and the CRC-32 of the payload.
+- A UTF-8 JSON header describing the lexicon (its hash, the signature of the table it was built from, the
+  origin language names and the q-grams) and the offset, dtype and length of every array section.
+- The payload: the array sections, each aligned to SECTION_ALIGNMENT bytes.
+
+The header checksum is verified on every open; the payload checksum requires reading the whole file, so it
+is only verified on request (see the verify command). A snapshot is written to a temporary file of its own,
+verified, and renamed into place, so a process opening it never sees a partial file and concurrent rebuilds
+cannot interleave their writes.
+
+The signature of the table is the random id of the database and the generation counter the triggers of
+data/schema.py bump on every insert, delete and content update of the `words` table, so any change to the
+words, their origins or their meanings, or a database rebuilt from scratch, makes the snapshot out of date,
+and checking it costs a single-row query.
+
+Usage:
+    python3 models/snapshot.py build-snapshot [--db DB] [--out PATH]
+    python3 models/snapshot.py verify [--db DB] [--out PATH]
+
+Modules used:
+- mmap: For mapping the snapshot file.
+- numpy: For the array sections.
+- struct, zlib: For the preamble and its checksums.
+- tempfile: For the temporary file a snapshot is written to.
+- argparse: For the command line interface.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+import numpy as np
+
+# Make the project packages importable when this file is run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.schema import ensure_generation_counter, words_generation
+from models.lexicon import Lexicon
+from models.ngram_index import QGramIndex
+
+MAGIC = b'ETYSNAP\0'
+FORMAT_VERSION = 1
+SNAPSHOT_FILE = 'lexicon.snapshot'
+SECTION_ALIGNMENT = 64
+
+# magic, format version, header length, header CRC-32, payload CRC-32
+_PREAMBLE = struct.Struct('<8sIIII')
+
+
+class SnapshotError(Exception):
+    """
+    Raised when a snapshot file is missing, corrupt or of an unsupported format version.
+    """
+
+
+class Snapshot(NamedTuple):
+    """
+    A lexicon and q-gram index opened from a snapshot file.
+
+    Attributes:
+        lexicon (Lexicon): The lexicon, backed by the mapped file.
+        qgram_index (QGramIndex): The q-gram index over the lexicon, backed by the mapped file.
+        header (Dict[str, Any]): The snapshot header.
+    """
+    lexicon: Lexicon
+    qgram_index: QGramIndex
+    header: Dict[str, Any]
+
+    @property
+    def version(self) -> str:
+        """
+        Returns:
+            str: The lexicon_version of the lexicon and table the snapshot was built from.
+        """
+        return lexicon_version(self.header['lexicon_hash'], self.header.get('signature') or {})
+
+
+def snapshot_path() -> str:
+    """
+    Return the default location of the snapshot.
+
+    Returns:
+        str: models/lexicon.snapshot in the project directory.
+    """
+    return os.path.join(os.environ.get("ETYMOAGENT"), 'models', SNAPSHOT_FILE)
+
+
+def table_signature(db_path: str) -> Dict[str, Any]:
+    """
+    Compute a cheap signature of the `words` table, used to tell whether a snapshot is out of date.
+
+    Args:
+        db_path (str): Path of the SQLite database.
+
+    Returns:
+        Dict[str, Any]: The random id of the database and the generation of the table, which changes with
+        every insert, delete and content update; both None if the database has no generation counter.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        database_id, generation = words_generation(conn) or (None, None)
+    finally:
+        conn.close()
+    return {'database_id': database_id, 'generation': generation}
+
+
+def lexicon_version(lexicon_hash: str, signature: Dict[str, Any]) -> str:
+    """
+    Identify the contents of a lexicon and of the table its meanings are read from.
+
+    Args:
+        lexicon_hash (str): The Lexicon.contents_hash of the lexicon.
+        signature (Dict[str, Any]): The table_signature of its database.
+
+    Returns:
+        str: The hash, the database id and the generation.
+    """
+    return f"{lexicon_hash}:{signature.get('database_id')}:{signature.get('generation')}"
+
+
+def write_snapshot(path: str, lexicon: Lexicon, qgram_index: QGramIndex,
+                   signature: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Write a lexicon and its q-gram index to a snapshot file.
+
+    Args:
+        path (str): The snapshot file.
+        lexicon (Lexicon): The lexicon.
+        qgram_index (QGramIndex): The q-gram index built over the lexicon.
+        signature (Optional[Dict[str, Any]]): The table_signature of the database the lexicon was loaded from.
+
+    Returns:
+        Dict[str, Any]: The header written to the file.
+
+    Raises:
+        SnapshotError: If the written file does not read back intact.
+    """
+    arrays: Dict[str, np.ndarray] = {
+        'buffer': np.frombuffer(bytes(lexicon.buffer), dtype=np.uint8),
+        'offsets': lexicon.offsets,
+        'origin_codes': lexicon.origin_codes,
+        'row_ids': lexicon.row_ids,
+    }
+    arrays.update({f'qgram_{name}': array for name, array in qgram_index.arrays().items()})
+
+    sections: Dict[str, Tuple[int, str, int]] = {}
+    position = 0
+    for name, array in arrays.items():
+        position = -(-position // SECTION_ALIGNMENT) * SECTION_ALIGNMENT
+        array = np.ascontiguousarray(array)
+        # Store in little-endian byte order whatever the machine
+        sections[name] = (position, array.dtype.newbyteorder('<').str, len(array))
+        position += array.nbytes
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'created_at': time.time(),
+        'lexicon_hash': lexicon.contents_hash(),
+        'signature': signature,
+        'words': len(lexicon),
+        'origin_names': lexicon.origin_names,
+        'q': qgram_index.q,
+        'grams': qgram_index.grams,
+        'sections': sections,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+
+    payload = bytearray(position)
+    for name, array in arrays.items():
+        offset, dtype, _ = sections[name]
+        data = np.ascontiguousarray(array, dtype=np.dtype(dtype)).tobytes()
+        payload[offset:offset + len(data)] = data
+
+    preamble = _PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes), zlib.crc32(header_bytes),
+                              zlib.crc32(payload))
+    padding = b'\0' * (-(len(preamble) + len(header_bytes)) % SECTION_ALIGNMENT)
+
+    # A temporary file of our own, in the same directory so the rename is atomic
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix='.tmp',
+                                    dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(preamble + header_bytes + padding)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        open_snapshot(tmp_path, verify=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return header
+
+
+def build_snapshot(db_path: str, path: str, q: int = 2) -> Dict[str, Any]:
+    """
+    Load the lexicon from the database, build its q-gram index and write both to a snapshot file.
+
+    The generation counter of the table is created if the database predates it, and read before the lexicon
+    is loaded, so a change made during the build leaves the snapshot out of date rather than unnoticed.
+
+    Args:
+        db_path (str): Path of the SQLite database.
+        path (str): The snapshot file.
+        q (int): The q-gram length of the index.
+
+    Returns:
+        Dict[str, Any]: The header written to the file.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_generation_counter(conn)
+    finally:
+        conn.close()
+    signature = table_signature(db_path)
+    lexicon = Lexicon.from_database(db_path)
+    return write_snapshot(path, lexicon, QGramIndex(lexicon, q), signature)
+
+
+def open_snapshot(path: str, db_path: Optional[str] = None, verify: bool = False) -> Snapshot:
+    """
+    Map a snapshot file and open its lexicon and q-gram index without copying the arrays.
+
+    Args:
+        path (str): The snapshot file.
+        db_path (Optional[str]): The database the lexicon's meanings are read from.
+        verify (bool): Also verify the payload checksum, which reads the whole file.
+
+    Returns:
+        Snapshot: The lexicon, the q-gram index and the header.
+
+    Raises:
+        SnapshotError: If the file is missing, corrupt or of another format version.
+    """
+    try:
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Cannot map snapshot {path}: {e}") from e
+
+    if len(mapping) < _PREAMBLE.size:
+        raise SnapshotError(f"Snapshot {path} is truncated")
+    magic, version, header_length, header_crc, payload_crc = _PREAMBLE.unpack_from(mapping)
+    if magic != MAGIC:
+        raise SnapshotError(f"{path} is not a lexicon snapshot")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"Snapshot {path} has format version {version}, expected {FORMAT_VERSION}")
+    header_bytes = mapping[_PREAMBLE.size:_PREAMBLE.size + header_length]
+    if len(header_bytes) != header_length or zlib.crc32(header_bytes) != header_crc:
+        raise SnapshotError(f"Snapshot {path} has a corrupt header")
+    header = json.loads(header_bytes)
+
+    payload_start = _PREAMBLE.size + header_length
+    payload_start += -payload_start % SECTION_ALIGNMENT
+    payload = memoryview(mapping)[payload_start:]
+    if verify and zlib.crc32(payload) != payload_crc:
+        raise SnapshotError(f"Snapshot {path} has a corrupt payload")
+
+    arrays: Dict[str, np.ndarray] = {}
+    for name, (offset, dtype, count) in header['sections'].items():
+        if offset + count * np.dtype(dtype).itemsize > len(payload):
+            raise SnapshotError(f"Snapshot {path} is truncated")
+        arrays[name] = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+
+    buffer_offset, _, buffer_length = header['sections']['buffer']
+    lexicon = Lexicon(payload[buffer_offset:buffer_offset + buffer_length], arrays['offsets'], arrays['origin_codes'], header['origin_names'], arrays['row_ids'],
+                      db_path)
+    qgram_arrays = {name[len('qgram_'):]: array for name, array in arrays.items() if name.startswith('qgram_')}
+    qgram_index = QGramIndex.from_arrays(lexicon, header['q'], header['grams'], qgram_arrays)
+    return Snapshot(lexicon, qgram_index, header)
+
+
+def is_current(header: Dict[str, Any], db_path: str) -> bool:
+    """
+    Check whether a snapshot was built from the current contents of a database.
+
+    Args:
+        header (Dict[str, Any]): The snapshot header.
+        db_path (str): Path of the SQLite database.
+
+    Returns:
+        bool: True if the database id and table generation recorded in the snapshot match the database.
+    """
+    signature = table_signature(db_path)
+    return signature['generation'] is not None and header.get('signature') == signature
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build and check the EtymoAgent lexicon snapshot.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in [('build-snapshot', "Write the lexicon and its q-gram index to a snapshot."),
+                               ('verify', "Check a snapshot's checksums and compare it with the database.")]:
+        subparser = subparsers.add_parser(command, help=help_text)
+        subparser.add_argument('--db', dest='db_name', default='etymoagent.db', help="Name of the database file.")
+        subparser.add_argument('--out', dest='path', help="Path of the snapshot file.")
+    args = parser.parse_args()
+
+    db_path = os.path.join(os.environ.get("ETYMOAGENT"), 'data', args.db_name)
+    path = args.path or snapshot_path()
+    start_time = time.time()
+    if args.command == 'build-snapshot':
+        header = build_snapshot(db_path, path)
+        print(f"Saved {header['words']} words ({os.path.getsize(path) / 1e6:.1f} MB) to {path}")
+    elif args.command == 'verify':
+        snapshot = open_snapshot(path, db_path, verify=True)
+        print(f"Snapshot {path}: {snapshot.header['words']} words, checksums OK")
+        if is_current(snapshot.header, db_path):
+            print("The snapshot matches the database.")
+        else:
+            print("The snapshot is out of date, run build-snapshot.")
+    print(f"Elapsed time: {time.time() - start_time:.2f} seconds")
@@ -0,0 +1,86 @@
+"""
+spacy_vectors.py: Batched spaCy word vectorization with an on-disk cache.
+
+The spaCy scripts used to call nlp(word) twice per lexicon word, running the full en_core_web_md pipeline
+each time. Word vectors only depend on the tokenizer and the static vector table, so the words are
+tokenized in batches with nlp.tokenizer.pipe and no other pipeline component runs; the resulting vectors
+are the same. The word -> vector table is cached in a .npz file keyed by the lexicon version and the spaCy
+model, so later runs load it instead of vectorizing again.
+
+Modules used:
+- numpy: For the cached vector matrix.
+- models.lexicon: For the lexicon version the cache is keyed by.
+"""
+
+import os
+from typing import Dict, Iterable
+import numpy as np
+from models.lexicon import lexicon_hash
+
+CACHE_DIR = "cache"
+
+
+def vectorize_words(nlp, words: Iterable[str], batch_size: int = 1000) -> Dict[str, np.ndarray]:
+    """
+    Look up the spaCy vectors of words, tokenizing them in batches.
+
+    Args:
+        nlp: The loaded spaCy language model.
+        words (Iterable[str]): The words to vectorize.
+        batch_size (int): Number of words tokenized per batch.
+
+    Returns:
+        Dict[str, np.ndarray]: The vector of every word that has one.
+    """
+    unique_words = list(dict.fromkeys(words))
+    word_vectors = {}
+    for word, doc in zip(unique_words, nlp.tokenizer.pipe(unique_words, batch_size=batch_size)):
+        if doc.has_vector:
+            word_vectors[word] = doc.vector
+    return word_vectors
+
+
+def cache_path(nlp, words: Iterable[str], cache_dir: str) -> str:
+    """
+    Return the cache file for a word list and spaCy model.
+
+    Args:
+        nlp: The loaded spaCy language model.
+        words (Iterable[str]): The lexicon words.
+        cache_dir (str): The directory holding the cache files.
+
+    Returns:
+        str: The path of the cache file.
+    """
+    model = f"{nlp.meta.get('lang')}_{nlp.meta.get('name')}-{nlp.meta.get('version')}"
+    version = lexicon_hash((word,) for word in dict.fromkeys(words))
+    return os.path.join(cache_dir, f"spacy_vectors_{model}_{version[:16]}.npz")
+
+
+def load_or_vectorize(nlp, words: Iterable[str], cache_dir: str) -> Dict[str, np.ndarray]:
+    """
+    Load the word vectors from the cache, vectorizing and caching them on a miss.
+
+    Args:
+        nlp: The loaded spaCy language model.
+        words (Iterable[str]): The lexicon words.
+        cache_dir (str): The directory holding the cache files.
+
+    Returns:
+        Dict[str, np.ndarray]: The vector of every word that has one.
+    """
+    words = list(words)
+    path = cache_path(nlp, words, cache_dir)
+    if os.path.isfile(path):
+        with np.load(path) as cached:
+            return dict(zip(cached['words'].tolist(), cached['vectors']))
+
+    word_vectors = vectorize_words(nlp, words)
+    os.makedirs(cache_dir, exist_ok=True)
+    cached_words = list(word_vectors)
+    vectors = np.stack([word_vectors[word] for word in cached_words]) if cached_words else np.zeros((0, 0))
+    # Write to a temporary file first so concurrent readers never see a partial cache
+    tmp_path = f"{path[:-len('.npz')]}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, words=np.array(cached_words, dtype=str), vectors=vectors)
+    os.replace(tmp_path, path)
+    return word_vectors
@@ -0,0 +1,149 @@
+"""
+symspell.py: A symmetric-delete dictionary for constant-time lookup of words within a small edit distance.
+
+Every lexicon word is expanded once into all strings obtained by deleting up to max_distance characters,
+and each of those deletes maps back to the words that produce it. Two words within edit distance k always
+share a string reachable from both by at most k deletes, so a query only needs to generate its own deletes
+and look them up to find every word within max_distance. The candidates are then verified with the exact
+edit distance. Ties resolve to the lowest row id, the same as a linear scan.
+
+When nothing lies within max_distance, nearest() returns None and the caller falls back to a full scan.
+Memory grows quickly with max_distance, so memory_usage() reports the size of the dictionary.
+
+Modules used:
+- Levenshtein: For verifying candidates with the exact edit distance.
+- sys: For estimating the memory used by the dictionary.
+"""
+
+import sys
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+import Levenshtein
+
+
+def deletes(word: str, max_distance: int) -> Set[str]:
+    """
+    Generate every string obtained by deleting up to max_distance characters from a word.
+
+    Args:
+        word (str): The word to expand.
+        max_distance (int): The maximum number of deletions.
+
+    Returns:
+        Set[str]: The deletes, including the word itself.
+    """
+    result = {word}
+    level = {word}
+    for _ in range(max_distance):
+        level = {w[:i] + w[i + 1:] for w in level for i in range(len(w))}
+        if not level:
+            break
+        result |= level
+    return result
+
+
+class SymSpellIndex:
+    """
+    Precomputed deletion dictionary over the lexicon words.
+
+    Attributes:
+        max_distance (int): The largest edit distance a lookup can resolve.
+    """
+
+    def __init__(self, words: Sequence[str], max_distance: int = 2,
+                 distance: Callable[[str, str], int] = Levenshtein.distance) -> None:
+        """
+        Build the deletion dictionary.
+
+        Args:
+            words (Sequence[str]): The words to index; a word's position is its row id.
+            max_distance (int): The largest edit distance a lookup can resolve.
+            distance (Callable[[str, str], int]): The exact edit distance function.
+        """
+        self.max_distance = max_distance
+        self._distance = distance
+        self._lexicon = words
+        # Distinct words and the first row id each one occurs at
+        self._words: List[str] = []
+        self._row_ids: List[int] = []
+        self._deletes: Dict[str, List[int]] = defaultdict(list)
+
+        first_row: Dict[str, int] = {}
+        for row_id, word in enumerate(words):
+            if word not in first_row:
+                first_row[word] = row_id
+                self._words.append(word)
+                self._row_ids.append(row_id)
+        for word_id, word in enumerate(self._words):
+            for delete in deletes(word, max_distance):
+                self._deletes[delete].append(word_id)
+        self._deletes = dict(self._deletes)
+
+    def __len__(self) -> int:
+        return len(self._lexicon)
+
+    def word(self, row_id: int) -> str:
+        """
+        Return the word stored at a row id.
+
+        Args:
+            row_id (int): The row id.
+
+        Returns:
+            str: The word.
+        """
+        return self._lexicon[row_id]
+
+    def nearest(self, query: str) -> Optional[Tuple[int, int]]:
+        """
+        Find the closest word within max_distance of the query.
+
+        Args:
+            query (str): The word to look up.
+
+        Returns:
+            Optional[Tuple[int, int]]: The row id of the closest word and its distance, or None if no
+            word lies within max_distance.
+        """
+        exact = self._deletes.get(query)
+        if exact:
+            for word_id in exact:
+                if self._words[word_id] == query:
+                    return self._row_ids[word_id], 0
+
+        candidates: Set[int] = set()
+        for delete in deletes(query, self.max_distance):
+            candidates.update(self._deletes.get(delete, ()))
+
+        best = None
+        for word_id in candidates:
+            d = self._distance(query, self._words[word_id])
+            if d > self.max_distance:
+                continue
+            key = (d, self._row_ids[word_id])
+            if best is None or key < best:
+                best = key
+        if best is None:
+            return None
+        return best[1], best[0]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Report the size of the deletion dictionary.
+
+        Returns:
+            Dict[str, int]: The number of distinct words, delete keys and postings, and an estimate
+            of the bytes held by the dictionary.
+        """
+        postings = sum(len(ids) for ids in self._deletes.values())
+        size = sys.getsizeof(self._deletes)
+        size += sum(sys.getsizeof(key) + sys.getsizeof(ids) for key, ids in self._deletes.items())
+        size += sys.getsizeof(self._words) + sum(sys.getsizeof(word) for word in self._words)
+        size += sys.getsizeof(self._row_ids)
+        return {
+            'max_distance': self.max_distance,
+            'words': len(self._words),
+            'delete_keys': len(self._deletes),
+            'postings': postings,
+            'approx_bytes': size,
+        }
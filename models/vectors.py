@@ -0,0 +1,245 @@
+"""
+vectors.py: Build steps for the word vectors used by the semantic features of EtymoAgent.
+
+Parsing GoogleNews-vectors-negative300.bin with load_word2vec_format takes minutes and several GB of RAM
+every time. The convert step parses it once and saves it in gensim's native KeyedVectors format, which
+stores the vector matrix as a separate .npy file. agent.load_pretrained_word2vec then opens that file with
+mmap, so loading is near-instant and worker processes share the same physical pages through the page cache.
+
+The subset step goes further: extract_semantic_features only ever looks up lexicon words, so it extracts
+the vectors of the words in the `words` table, plus optionally their nearest neighbours, into a compact
+float32 or float16 matrix with a word->row index (a VectorTable). That takes the semantic model from
+gigabytes down to megabytes, small enough to load in every web worker. Finding the neighbours with
+KeyedVectors.most_similar is an exact scan of all 3M vectors per word; with --ann-nprobe they come from an
+approximate IVF index over the full model instead (see models/embedding_index.py).
+
+Usage:
+    python3 models/vectors.py convert
+    python3 models/vectors.py subset [--neighbours N] [--ann-nprobe P] [--dtype float16]
+
+Modules used:
+- gensim.models.KeyedVectors: For reading the word2vec binary and writing the native format.
+- numpy: For the compact vector matrix.
+- argparse: For the command line interface.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Union
+import numpy as np
+from gensim.models import KeyedVectors
+
+# Make the project packages importable when this file is run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.embedding_index import IVFIndex
+
+PRETRAINED_BIN = "GoogleNews-vectors-negative300.bin"
+PRETRAINED_KV = "GoogleNews-vectors-negative300.kv"
+LEXICON_VECTORS_DIR = "lexicon_vectors"
+
+
+def models_dir() -> str:
+    """
+    Return the directory holding the model files.
+
+    Returns:
+        str: The models directory of the project.
+    """
+    return os.path.join(os.environ.get("ETYMOAGENT"), 'models')
+
+
+def convert_pretrained_word2vec(bin_path: Optional[str] = None, kv_path: Optional[str] = None) -> str:
+    """
+    Convert the word2vec binary into the memory-mappable native KeyedVectors format.
+
+    Args:
+        bin_path (Optional[str]): The word2vec binary; defaults to models/GoogleNews-vectors-negative300.bin.
+        kv_path (Optional[str]): The output file; defaults to models/GoogleNews-vectors-negative300.kv.
+
+    Returns:
+        str: The path of the converted model.
+
+    Raises:
+        FileNotFoundError: If the word2vec binary does not exist.
+    """
+    bin_path = bin_path or os.path.join(models_dir(), PRETRAINED_BIN)
+    kv_path = kv_path or os.path.join(models_dir(), PRETRAINED_KV)
+    if not os.path.isfile(bin_path):
+        raise FileNotFoundError(f"Pre-trained Word2Vec model not found at {bin_path}")
+
+    print(f"Loading Word2Vec model from {bin_path}...")
+    model = KeyedVectors.load_word2vec_format(bin_path, binary=True)
+    # Arrays are always written as separate .npy files so that they can be memory-mapped on load
+    model.save(kv_path, sep_limit=0)
+    print(f"Saved memory-mappable Word2Vec model to {kv_path}")
+    return kv_path
+
+
+class VectorTable:
+    """
+    Compact word vector table with the same lookup interface as KeyedVectors.
+
+    Attributes:
+        words (List[str]): The words, in row order.
+        vectors (np.ndarray): The (len(words), vector_size) vector matrix.
+        vector_size (int): The dimensionality of the vectors.
+    """
+
+    def __init__(self, words: List[str], vectors: np.ndarray) -> None:
+        """
+        Create a table from a word list and the matching vector matrix.
+
+        Args:
+            words (List[str]): The words, in row order.
+            vectors (np.ndarray): The vector matrix, one row per word.
+        """
+        self.words = words
+        self.vectors = vectors
+        self.vector_size = vectors.shape[1]
+        self._index: Dict[str, int] = {word: row for row, word in enumerate(words)}
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._index
+
+    def __getitem__(self, word: str) -> np.ndarray:
+        return np.asarray(self.vectors[self._index[word]], dtype=np.float32)
+
+    def row(self, word: str) -> int:
+        """
+        Return the row of a word in the vector matrix.
+
+        Args:
+            word (str): The word.
+
+        Returns:
+            int: The row index.
+        """
+        return self._index[word]
+
+    def save(self, directory: str) -> None:
+        """
+        Save the table as vectors.npy and vocab.json in a directory.
+
+        Args:
+            directory (str): The directory to write to.
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'vectors.npy'), self.vectors)
+        with open(os.path.join(directory, 'vocab.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.words, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'VectorTable':
+        """
+        Load a table written with save().
+
+        Args:
+            directory (str): The directory to read from.
+            mmap (bool): Whether to memory-map the vector matrix.
+
+        Returns:
+            VectorTable: The loaded table.
+        """
+        vectors = np.load(os.path.join(directory, 'vectors.npy'), mmap_mode='r' if mmap else None)
+        with open(os.path.join(directory, 'vocab.json'), encoding='utf-8') as f:
+            words = json.load(f)
+        return cls(words, vectors)
+
+
+def vectors_fingerprint(word_vectors: Union[KeyedVectors, VectorTable], samples: int = 256) -> str:
+    """
+    Compute a fingerprint identifying a set of word vectors without reading the whole matrix.
+
+    Args:
+        word_vectors (Union[KeyedVectors, VectorTable]): The word vectors.
+        samples (int): Number of evenly spaced rows whose word and vector are hashed.
+
+    Returns:
+        str: Hex digest of the matrix shape and dtype and of the sampled rows.
+    """
+    if isinstance(word_vectors, VectorTable):
+        words = word_vectors.words
+    else:
+        words = getattr(word_vectors, 'index_to_key', None) or word_vectors.index2word
+    vectors = word_vectors.vectors
+    digest = hashlib.sha256(f"{vectors.shape}:{vectors.dtype}".encode('utf-8'))
+    if len(words):
+        for row in np.unique(np.linspace(0, len(words) - 1, num=min(samples, len(words))).astype(np.int64)):
+            digest.update(words[row].encode('utf-8'))
+            digest.update(np.ascontiguousarray(vectors[row]).tobytes())
+    return digest.hexdigest()
+
+
+def build_vector_subset(words: Iterable[str], model: KeyedVectors, neighbours: int = 0,
+                        dtype: str = 'float32', ann_nprobe: Optional[int] = None) -> VectorTable:
+    """
+    Extract the vectors of the lexicon words, and optionally their neighbours, from a full model.
+
+    Args:
+        words (Iterable[str]): The lexicon words.
+        model (KeyedVectors): The full pre-trained model.
+        neighbours (int): Number of nearest neighbours of each lexicon word to keep as well.
+        dtype (str): The dtype of the stored matrix, 'float32' or 'float16'.
+        ann_nprobe (Optional[int]): If given, neighbours are found with an IVF index scoring this many
+            clusters per word instead of an exact scan of the model.
+
+    Returns:
+        VectorTable: The table holding only the selected vectors.
+    """
+    selected: Dict[str, None] = {}
+    for word in words:
+        if word in model and word not in selected:
+            selected[word] = None
+    if neighbours > 0 and ann_nprobe:
+        model_words = getattr(model, 'index_to_key', None) or model.index2word
+        ivf = IVFIndex(model_words, model.vectors, nprobe=ann_nprobe)
+        for word in list(selected):
+            # Ask for one extra result since the word itself is usually its own closest neighbour
+            found = [neighbour for neighbour, _ in ivf.search(model[word], neighbours + 1) if neighbour != word]
+            for neighbour in found[:neighbours]:
+                selected.setdefault(neighbour, None)
+    elif neighbours > 0:
+        for word in list(selected):
+            for neighbour, _ in model.most_similar(word, topn=neighbours):
+                selected.setdefault(neighbour, None)
+
+    subset_words = list(selected)
+    vectors = np.empty((len(subset_words), model.vector_size), dtype=dtype)
+    for row, word in enumerate(subset_words):
+        vectors[row] = model[word]
+    return VectorTable(subset_words, vectors)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build steps for EtymoAgent word vectors.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert = subparsers.add_parser('convert', help="Convert the word2vec binary to the native mmap format.")
+    convert.add_argument('--bin', dest='bin_path', help="Path of the word2vec binary.")
+    convert.add_argument('--out', dest='kv_path', help="Path of the converted model.")
+    subset = subparsers.add_parser('subset', help="Extract the lexicon's vectors into a compact table.")
+    subset.add_argument('--neighbours', type=int, default=0, help="Nearest neighbours to keep per word.")
+    subset.add_argument('--ann-nprobe', type=int, default=None, help="Find neighbours with an IVF index.")
+    subset.add_argument('--dtype', choices=['float32', 'float16'], default='float32')
+    subset.add_argument('--out', dest='out_dir', help="Directory of the vector table.")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    if args.command == 'convert':
+        convert_pretrained_word2vec(args.bin_path, args.kv_path)
+    elif args.command == 'subset':
+        from models.agent import load_and_prepare_data, load_pretrained_word2vec
+        df = load_and_prepare_data('etymoagent.db')
+        table = build_vector_subset(df['word'], load_pretrained_word2vec(), args.neighbours, args.dtype,
+                                    args.ann_nprobe)
+        out_dir = args.out_dir or os.path.join(models_dir(), LEXICON_VECTORS_DIR)
+        table.save(out_dir)
+        print(f"Saved {len(table)} vectors ({table.vectors.nbytes / 1e6:.1f} MB) to {out_dir}")
+    print(f"Elapsed time: {time.time() - start_time:.2f} seconds")
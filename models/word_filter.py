@@ -0,0 +1,174 @@
+"""
+word_filter.py: The set of English words EtymoAgent accepts as queries, precomputed from WordNet.
+
+The web application used to check every query with wordnet.synsets, which loads the WordNet corpus on
+first use and runs morphological analysis on every call, and downloaded the corpus when it was imported.
+The build step enumerates once what that check accepts: every WordNet lemma, every form WordNet's morphy
+reduces to a lemma of the same part of speech with one of its suffix rules, and the irregular forms of the
+exception lists. The words are written to a gzip-compressed, sorted word list that the application loads
+into a frozenset, so checking a word is a set lookup and the application needs neither NLTK nor network
+access at startup. If the word list has not been built, load_or_build_valid_words builds it from WordNet on
+first use and saves it for the next start.
+
+Unlike NLTK releases that keep applying the suffix rules until a lemma is found, only one rule is applied,
+as in WordNet's own morphy, so made-up forms such as "catss" are not accepted.
+
+Usage:
+    python3 models/word_filter.py build [--out PATH]
+
+Modules used:
+- nltk.corpus.wordnet: For the lemmas and exception lists, at build time only.
+- gzip: For the compressed word list.
+- argparse: For the command line interface.
+"""
+
+import argparse
+import gzip
+import os
+import time
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Set, Tuple
+
+VALID_WORDS_FILE = 'valid_words.txt.gz'
+
+# The suffix rules of WordNet's morphy: (inflected ending, lemma ending) per part of speech
+MORPHOLOGICAL_SUBSTITUTIONS: Dict[str, List[Tuple[str, str]]] = {
+    'n': [('s', ''), ('ses', 's'), ('ves', 'f'), ('xes', 'x'), ('zes', 'z'), ('ches', 'ch'), ('shes', 'sh'),
+          ('men', 'man'), ('ies', 'y')],
+    'v': [('s', ''), ('ies', 'y'), ('es', 'e'), ('es', ''), ('ed', 'e'), ('ed', ''), ('ing', 'e'), ('ing', '')],
+    'a': [('er', ''), ('est', ''), ('er', 'e'), ('est', 'e')],
+    'r': [],
+}
+
+# The exception list of each part of speech
+EXCEPTION_FILES = {'n': 'noun.exc', 'v': 'verb.exc', 'a': 'adj.exc', 'r': 'adv.exc'}
+
+
+def valid_words_path() -> str:
+    """
+    Return the default location of the word list.
+
+    Returns:
+        str: models/valid_words.txt.gz in the project directory.
+    """
+    return os.path.join(os.environ.get("ETYMOAGENT"), 'models', VALID_WORDS_FILE)
+
+
+def inflected_forms(lemma: str, pos: str) -> Iterator[str]:
+    """
+    Generate the regular forms morphy reduces to a lemma.
+
+    Args:
+        lemma (str): The lemma.
+        pos (str): Its part of speech, one of 'n', 'v', 'a' and 'r'.
+
+    Yields:
+        str: The inflected forms.
+    """
+    for inflected, ending in MORPHOLOGICAL_SUBSTITUTIONS[pos]:
+        if lemma.endswith(ending):
+            yield lemma[:len(lemma) - len(ending)] + inflected
+
+
+def build_valid_words(wordnet: Any) -> FrozenSet[str]:
+    """
+    Enumerate the words wordnet.synsets finds at least one synset for.
+
+    Args:
+        wordnet (WordNetCorpusReader): The loaded WordNet corpus.
+
+    Returns:
+        FrozenSet[str]: The lemmas, their regular inflected forms and their irregular forms.
+    """
+    words: Set[str] = set()
+    for pos in MORPHOLOGICAL_SUBSTITUTIONS:
+        lemmas = set(wordnet.all_lemma_names(pos))
+        words.update(lemmas)
+        for lemma in lemmas:
+            words.update(inflected_forms(lemma, pos))
+        with wordnet.open(EXCEPTION_FILES[pos]) as exceptions:
+            for line in exceptions:
+                inflected, *bases = line.split()
+                if any(base in lemmas for base in bases):
+                    words.add(inflected)
+    return frozenset(words)
+
+
+def build_from_wordnet() -> FrozenSet[str]:
+    """
+    Load WordNet, downloading it if needed, and enumerate the valid words.
+
+    Returns:
+        FrozenSet[str]: The words build_valid_words enumerates.
+    """
+    import nltk
+    nltk.data.path.append("/opt/anaconda3/envs/etymoagent/nltk_data")
+    nltk.download('wordnet', quiet=True)
+    from nltk.corpus import wordnet
+    return build_valid_words(wordnet)
+
+
+def save_valid_words(words: Iterable[str], path: str) -> None:
+    """
+    Write a word list, one word per line in sorted order.
+
+    Args:
+        words (Iterable[str]): The words.
+        path (str): The compressed word list file.
+    """
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        f.write('\n'.join(sorted(words)))
+    os.replace(tmp_path, path)
+
+
+def load_valid_words(path: str) -> FrozenSet[str]:
+    """
+    Load a word list written by save_valid_words.
+
+    Args:
+        path (str): The compressed word list file.
+
+    Returns:
+        FrozenSet[str]: The words.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return frozenset(f.read().split('\n'))
+
+
+def load_or_build_valid_words(path: str) -> FrozenSet[str]:
+    """
+    Load a word list, building it from WordNet and saving it first if it does not exist.
+
+    Args:
+        path (str): The compressed word list file.
+
+    Returns:
+        FrozenSet[str]: The words.
+    """
+    if os.path.isfile(path):
+        return load_valid_words(path)
+    print(f"Word list {path} not found, building it from WordNet "
+          f"(run `python3 models/word_filter.py build` to do this ahead of time)...")
+    words = build_from_wordnet()
+    try:
+        save_valid_words(words, path)
+        print(f"Saved {len(words)} words to {path}")
+    except OSError as e:
+        print(f"Error saving the word list: {e}")
+    return words
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the set of words EtymoAgent accepts as queries.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="Enumerate the WordNet lemmas and their inflected forms.")
+    build.add_argument('--out', dest='path', help="Path of the word list.")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    if args.command == 'build':
+        words = build_from_wordnet()
+        path = args.path or valid_words_path()
+        save_valid_words(words, path)
+        print(f"Saved {len(words)} words ({os.path.getsize(path) / 1e6:.1f} MB) to {path}")
+    print(f"Elapsed time: {time.time() - start_time:.2f} seconds")
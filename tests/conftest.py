@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Make the project packages importable from the tests
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,209 @@
+"""
+Tests of the crawler against a local stand-in for Wiktionary serving the recorded pages in fixtures/wiktionary.
+"""
+
+import asyncio
+import os
+import sqlite3
+from typing import Callable, List, Optional, Set
+from aiohttp import web
+from lxml import etree
+from data.crawler import Crawler
+from data.etymology_matcher import EtymologyMatcher
+from data.extraction import ETYMOLOGY_SECTION, MEANING_SECTIONS, extract_sections
+from data.pipeline import ParsePipeline
+from data.schema import Row, ensure_words_schema
+from data.writer import WordWriter
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'wiktionary')
+CATEGORY_PATH = '/w/index.php?title=Category:English_terms_derived_from_Latin&from=A'
+MATCHER = EtymologyMatcher(['Latin'])
+
+
+def word_links(html_content: str, letter: str) -> List[str]:
+    # The same selection as data.database.extract_word_links
+    root = etree.fromstring(html_content, etree.HTMLParser())
+    return [href for href in root.xpath('//a/@href')
+            if href.startswith(f'/wiki/{letter}') or href.startswith(f'/wiki/{letter.lower()}')]
+
+
+def parse_page(html_content: str) -> List[Row]:
+    # The same rows as data.database.parse_word_page, for Latin only
+    sections = extract_sections(html_content)
+    meanings = [sections[s] for s in MEANING_SECTIONS]
+    if not any(meanings):
+        return []
+    return [(word, language, *meanings) for language, word in MATCHER.find_pairs(sections[ETYMOLOGY_SECTION])]
+
+
+def parse_page_failing_on_avis(html_content: str) -> List[Row]:
+    # Stands for a page the parser cannot handle
+    if 'Latin avis' in html_content:
+        raise ValueError("unparseable page")
+    return parse_page(html_content)
+
+
+class StandIn:
+    """
+    Local HTTP server serving the recorded pages and logging the requested paths.
+    """
+
+    def __init__(self) -> None:
+        self.requested: List[str] = []
+        self.failing: Set[str] = set()
+        self.runner: Optional[web.AppRunner] = None
+        self.base_url = ''
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requested.append(request.path_qs)
+        if request.path in self.failing:
+            return web.Response(status=500)
+        if request.path == '/w/index.php':
+            name = 'category_latin_A'
+        else:
+            name = request.match_info['name']
+        path = os.path.join(FIXTURES_DIR, f'{name}.html')
+        if not os.path.isfile(path):
+            return web.Response(status=404)
+        with open(path, encoding='utf-8') as f:
+            return web.Response(text=f.read(), content_type='text/html')
+
+    async def __aenter__(self) -> 'StandIn':
+        app = web.Application()
+        app.router.add_get('/w/index.php', self.handle)
+        app.router.add_get('/wiki/{name}', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f'http://127.0.0.1:{port}'
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.runner.cleanup()
+
+
+async def crawl(server: StandIn, db_path: str, resume: bool = False, write: bool = True,
+                parse: Callable[[str], List[Row]] = parse_page) -> None:
+    # As data.database.initialize_database does, before the crawler and the writer open their connections
+    conn = sqlite3.connect(db_path)
+    ensure_words_schema(conn)
+    conn.close()
+    with WordWriter(db_path, flush_interval=0.05) as writer:
+        pipeline = ParsePipeline(parse, writer, n_workers=1, mark_done=True)
+
+        async def drop_page(url: str, html_content: str) -> None:
+            # Stands for a crawl interrupted before the rows of its pages were written
+            return None
+
+        crawler = Crawler(db_path, on_category=word_links, on_word_page=pipeline.submit if write else drop_page,
+                          base_url=server.base_url, concurrency=2, requests_per_second=0, max_retries=0,
+                          backoff=0, defer_done=True)
+        async with pipeline:
+            await crawler.run([(f'{server.base_url}{CATEGORY_PATH}', 'A')], resume=resume)
+
+
+def statuses(db_path: str) -> dict:
+    conn = sqlite3.connect(db_path)
+    try:
+        return {url.rsplit('/', 1)[-1]: status for url, status in conn.execute("SELECT url, status FROM crawl_queue")
+                if '/wiki/' in url}
+    finally:
+        conn.close()
+
+
+def words(db_path: str) -> list:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT word, origin_language, noun, adj FROM words ORDER BY word").fetchall()
+    finally:
+        conn.close()
+
+
+EXPECTED_WORDS = [
+    ('aqua', 'Latin', 'Water. ', 'Of a bluish-green colour. '),
+    ('avis', 'Latin', 'A bird. ', 'Of, relating to, or characteristic of birds. '),
+]
+
+
+def test_crawl_writes_rows_and_marks_pages_done(tmp_path):
+    db_path = str(tmp_path / 'etymoagent.db')
+
+    async def main():
+        async with StandIn() as server:
+            await crawl(server, db_path)
+
+    asyncio.run(main())
+    assert words(db_path) == EXPECTED_WORDS
+    # Only the links starting with the category letter are followed; the appendix page does not exist
+    assert statuses(db_path) == {'aqua': 'done', 'avian': 'done', 'Appendix:Latin': 'failed'}
+
+
+def test_resume_recrawls_pages_whose_rows_were_not_written(tmp_path):
+    db_path = str(tmp_path / 'etymoagent.db')
+
+    async def main():
+        async with StandIn() as server:
+            await crawl(server, db_path, write=False)
+            assert statuses(db_path) == {'aqua': 'in_progress', 'avian': 'in_progress', 'Appendix:Latin': 'failed'}
+            server.requested.clear()
+            await crawl(server, db_path, resume=True)
+            return server.requested
+
+    requested = asyncio.run(main())
+    assert sorted(requested) == ['/wiki/Appendix:Latin', '/wiki/aqua', '/wiki/avian']
+    assert words(db_path) == EXPECTED_WORDS
+    assert statuses(db_path)['aqua'] == statuses(db_path)['avian'] == 'done'
+
+
+def test_resume_retries_failed_pages_only(tmp_path):
+    db_path = str(tmp_path / 'etymoagent.db')
+
+    async def main():
+        async with StandIn() as server:
+            server.failing.add('/wiki/avian')
+            await crawl(server, db_path)
+            assert statuses(db_path)['avian'] == 'failed'
+            assert words(db_path) == EXPECTED_WORDS[:1]
+            server.failing.clear()
+            server.requested.clear()
+            await crawl(server, db_path, resume=True)
+            return server.requested
+
+    requested = asyncio.run(main())
+    assert sorted(requested) == ['/wiki/Appendix:Latin', '/wiki/avian']
+    assert words(db_path) == EXPECTED_WORDS
+
+
+def test_resume_retries_pages_that_failed_to_parse(tmp_path):
+    db_path = str(tmp_path / 'etymoagent.db')
+
+    async def main():
+        async with StandIn() as server:
+            await crawl(server, db_path, parse=parse_page_failing_on_avis)
+            assert statuses(db_path)['avian'] == 'failed'
+            assert words(db_path) == EXPECTED_WORDS[:1]
+            server.requested.clear()
+            await crawl(server, db_path, resume=True)
+            return server.requested
+
+    requested = asyncio.run(main())
+    assert sorted(requested) == ['/wiki/Appendix:Latin', '/wiki/avian']
+    assert words(db_path) == EXPECTED_WORDS
+    assert statuses(db_path)['avian'] == 'done'
+
+
+def test_fresh_crawl_starts_over(tmp_path):
+    db_path = str(tmp_path / 'etymoagent.db')
+
+    async def main():
+        async with StandIn() as server:
+            await crawl(server, db_path)
+            server.requested.clear()
+            await crawl(server, db_path)
+            return server.requested
+
+    requested = asyncio.run(main())
+    assert len(requested) == 4
+    assert words(db_path) == EXPECTED_WORDS
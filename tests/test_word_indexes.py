@@ -0,0 +1,84 @@
+"""
+Randomized equivalence tests of the nearest-word indexes against the brute-force scan.
+
+Every index must return what brute_force_nearest returns, ties included: the lowest row id among the words
+at the smallest distance. SymSpellIndex only resolves queries within its max_distance and returns None
+beyond it.
+"""
+
+import random
+from typing import List
+import pytest
+from models.bktree import BKTree
+from models.lexicon import Lexicon
+from models.ngram_index import QGramIndex, brute_force_nearest
+from models.symspell import SymSpellIndex
+
+
+def random_words(rng: random.Random, count: int, alphabet: str, max_length: int) -> List[str]:
+    # A small alphabet and short words give many duplicates and many ties
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, max_length))) for _ in range(count)]
+
+
+INDEXES = {
+    'bktree': BKTree,
+    'qgram1': lambda words: QGramIndex(words, q=1),
+    'qgram2': QGramIndex,
+    'qgram3': lambda words: QGramIndex(words, q=3),
+}
+
+
+@pytest.mark.parametrize('name', sorted(INDEXES))
+@pytest.mark.parametrize('seed', range(3))
+def test_index_matches_brute_force(name, seed):
+    rng = random.Random(seed)
+    words = random_words(rng, 500, 'abcde', 8)
+    index = INDEXES[name](words)
+    for _ in range(300):
+        query = ''.join(rng.choice('abcdefg') for _ in range(rng.randint(0, 10)))
+        assert index.nearest(query) == brute_force_nearest(query, words), query
+
+
+@pytest.mark.parametrize('max_distance', [1, 2])
+@pytest.mark.parametrize('seed', range(3))
+def test_symspell_matches_brute_force_within_max_distance(max_distance, seed):
+    rng = random.Random(seed)
+    words = random_words(rng, 500, 'abcde', 7)
+    index = SymSpellIndex(words, max_distance=max_distance)
+    for _ in range(300):
+        query = ''.join(rng.choice('abcdef') for _ in range(rng.randint(0, 8)))
+        expected = brute_force_nearest(query, words)
+        assert index.nearest(query) == (expected if expected[1] <= max_distance else None), query
+
+
+@pytest.mark.parametrize('build', [BKTree, QGramIndex, SymSpellIndex], ids=['bktree', 'qgram', 'symspell'])
+def test_ties_resolve_to_lowest_row_id(build):
+    words = ['ba', 'ab', 'cab', 'ab', 'aa']
+    index = build(words)
+    # 'ba' and 'ab' are both one edit away from 'bb'
+    assert index.nearest('bb') == (0, 1)
+    # The duplicate 'ab' at row 3 loses to row 1
+    assert index.nearest('ab') == (1, 0)
+    # 'ab' at row 1 and 'cab' at row 2 are both one edit away from 'xab'
+    assert index.nearest('xab') == (1, 1)
+    assert index.nearest('cabb') == (2, 1)
+
+
+def test_indexes_over_lexicon_match_brute_force():
+    rng = random.Random(7)
+    words = random_words(rng, 300, 'abcdé', 6)
+    lexicon = Lexicon.from_rows((row_id, word, 'Latin') for row_id, word in enumerate(words))
+    indexes = [BKTree(lexicon), QGramIndex(lexicon), SymSpellIndex(lexicon, max_distance=3)]
+    for _ in range(200):
+        query = ''.join(rng.choice('abcdéf') for _ in range(rng.randint(1, 6)))
+        expected = brute_force_nearest(query, words)
+        for index in indexes[:2]:
+            assert index.nearest(query) == expected, (type(index).__name__, query)
+        assert indexes[2].nearest(query) == (expected if expected[1] <= 3 else None), query
+
+
+def test_empty_indexes():
+    assert BKTree([]).nearest('a') is None
+    assert QGramIndex([]).nearest('a') is None
+    assert SymSpellIndex([]).nearest('a') is None
+    assert brute_force_nearest('a', []) is None